@@ -1,17 +1,37 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, Request, request, jsonify, send_file, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
+import atexit
+import concurrent.futures
+import json
 import os
-import tempfile
 import re
-from uuid import uuid4
-import requests
+import httpx
+from async_speech import AsyncSpeechRuntime
+from audio_store import AudioStore
 from database import KnowledgeDB
+from embeddings import DEFAULT_MODEL, HAS_EMBEDDINGS, Embedder
+from speech_client import AsyncSpeechBackend, BackendBusyError, CircuitOpenError
+from speech_setup import (
+    SPEECH_CONNECT_TIMEOUT, STT_API_KEY, STT_ENDPOINTS, STT_MODEL, TTS_ENDPOINTS, TTS_MODEL,
+    TTS_RESPONSE_FORMAT, TTS_VOICE, build_tts_backend, build_tts_cache, describe_endpoints, endpoint_pool,
+    iter_speech_chunks, request_speech, retry_policy,
+)
+from transcription_jobs import TranscriptionQueue, TERMINAL_STATUSES
+from tts_cache import TTSCache
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
 
-# Initialize database
-db = KnowledgeDB()
+# Initialize database (connections are pooled and shared across requests)
+db = KnowledgeDB(
+    pool_size=int(os.getenv("KNOWLEDGE_DB_POOL_SIZE", "8")),
+    category_spacing=int(os.getenv("QUESTION_CATEGORY_SPACING", "1")),
+)
+atexit.register(db.close)
+
+# Upcoming questions sent along with the current one, so the client can show
+# the next question without waiting for the server
+QUESTION_PREFETCH = int(os.getenv("QUESTION_PREFETCH", "3"))
 
 
 def _parse_question_file(file_path):
@@ -21,7 +41,6 @@ def _parse_question_file(file_path):
 
     # Try JSON first.
     try:
-        import json
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
         if isinstance(data, list):
@@ -34,10 +53,15 @@ def _parse_question_file(file_path):
                 elif isinstance(item, dict):
                     text = str(item.get("question", item.get("text", ""))).strip()
                     if text:
-                        out.append({
+                        question = {
                             "question": text,
                             "category": str(item.get("category", "General")).strip() or "General",
-                        })
+                        }
+                        # Keep processor scores so the question queue can order by them
+                        for field in ("priority_score", "alignment_score"):
+                            if item.get(field) is not None:
+                                question[field] = item[field]
+                        out.append(question)
             return out
     except Exception:
         pass
@@ -87,24 +111,110 @@ def ensure_questions_seeded():
 
     print("No seed question file found; database remains empty.")
 
-# OpenAI-compatible speech service configuration
-STT_BASE_URL = os.getenv("SPEECH_STT_BASE_URL", "http://localhost:5002/v1").rstrip("/")
-STT_API_KEY = os.getenv("SPEECH_STT_API_KEY", "none")
-STT_MODEL = os.getenv("SPEECH_STT_MODEL", "whisper-1")
+# Speech service settings (SPEECH_* environment variables) are read in speech_setup,
+# which prewarm_tts.py shares.
+tts_cache = build_tts_cache()
+TTS_CACHE_MAX_AGE = 24 * 60 * 60
+
+
+# Async runtime that multiplexes in-flight STT requests on one event loop
+speech_runtime = AsyncSpeechRuntime(
+    timeout=httpx.Timeout(float(os.getenv("SPEECH_STT_TIMEOUT", "120")), connect=SPEECH_CONNECT_TIMEOUT),
+    max_connections=int(os.getenv("SPEECH_STT_MAX_CONNECTIONS", "100")),
+)
+atexit.register(speech_runtime.close)
+
+
+# Speech backends: load-balanced endpoints, pooled connections, in-flight limits,
+# retries and per-endpoint circuit breakers
+stt_backend = AsyncSpeechBackend(
+    "STT",
+    endpoint_pool("STT", STT_ENDPOINTS),
+    speech_runtime,
+    api_key=STT_API_KEY,
+    max_inflight=int(os.getenv("SPEECH_STT_MAX_INFLIGHT", "8")),
+    retry=retry_policy(),
+)
+atexit.register(stt_backend.close)
+tts_backend = build_tts_backend()
+atexit.register(tts_backend.close)
+
+
+async def transcribe(audio_path):
+    """Transcribe an audio file through the STT backend"""
+    async def send(client, base_url, headers):
+        # Reopened per attempt so retries resend the whole file.
+        with open(audio_path, "rb") as audio_handle:
+            return await client.post(
+                f"{base_url}/audio/transcriptions",
+                headers=headers,
+                files={"file": ("recording.wav", audio_handle, "audio/wav")},
+                data={"model": STT_MODEL},
+            )
 
-TTS_BASE_URL = os.getenv("SPEECH_TTS_BASE_URL", "http://localhost:5001/v1").rstrip("/")
-TTS_API_KEY = os.getenv("SPEECH_TTS_API_KEY", "none")
-TTS_MODEL = os.getenv("SPEECH_TTS_MODEL", "piper")
-TTS_VOICE = os.getenv("SPEECH_TTS_VOICE", "en_US-lessac-medium")
-TTS_RESPONSE_FORMAT = os.getenv("SPEECH_TTS_RESPONSE_FORMAT", "mp3")
+    resp = await stt_backend.call(send)
+    transcription = str(resp.json().get("text", "")).strip()
+    if not transcription:
+        raise RuntimeError("STT response did not include transcription text")
+    return transcription
+
+
+# Semantic search over responses (needs sentence-transformers; SEMANTIC_SEARCH=0 disables it)
+semantic_indexer = None
+if HAS_EMBEDDINGS and os.getenv("SEMANTIC_SEARCH", "1") != "0":
+    from vector_index import SemanticIndexer
+    semantic_indexer = SemanticIndexer(
+        db,
+        Embedder(os.getenv("SEMANTIC_MODEL", DEFAULT_MODEL)),
+        index_dir=os.getenv("SEMANTIC_INDEX_DIR", "vector_index"),
+        dtype=os.getenv("SEMANTIC_INDEX_DTYPE", "float16"),
+    )
+
+
+def response_saved(*_args):
+    """Queue newly saved responses for semantic indexing"""
+    if semantic_indexer is not None:
+        semantic_indexer.notify()
+
+
+# Background transcription queue (used by /api/transcribe with mode=async)
+transcription_queue = TranscriptionQueue(
+    db,
+    speech_runtime,
+    transcribe,
+    max_concurrency=int(os.getenv("SPEECH_STT_MAX_CONCURRENCY", "2")),
+    max_attempts=int(os.getenv("SPEECH_STT_MAX_ATTEMPTS", "4")),
+    on_complete=response_saved,
+)
+SSE_KEEPALIVE_SECONDS = 15
+
+# Page size bounds for /api/responses
+DEFAULT_RESPONSES_PAGE_SIZE = 100
+MAX_RESPONSES_PAGE_SIZE = 500
+
+# Page size bounds for /api/search
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# Uploaded answers, stored under their content hash
+UPLOAD_DIR = 'uploads'
+audio_store = AudioStore(UPLOAD_DIR)
 
 
-def _auth_headers(api_key):
-    return {"Authorization": f"Bearer {api_key}"} if api_key and api_key != "none" else {}
+class UploadRequest(Request):
+    """Request that parses audio uploads directly into the audio store
 
-# Create uploads directory
-UPLOAD_DIR = 'uploads'
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+    Werkzeug would otherwise spool each file part to its own temp file, which
+    then had to be copied to the uploads directory.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and self.endpoint == 'transcribe_audio':
+            return audio_store.stage(filename)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+app.request_class = UploadRequest
 
 
 @app.route('/')
@@ -116,6 +226,9 @@ def index():
 @app.after_request
 def add_no_cache_headers(response):
     """Disable client/proxy caching to avoid stale frontend assets."""
+    # Cached speech audio is content-addressed and carries its own ETag.
+    if request.endpoint == 'speak_text' and response.status_code in (200, 206, 304):
+        return response
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
@@ -124,13 +237,14 @@ def add_no_cache_headers(response):
 
 @app.route('/api/current-question', methods=['GET'])
 def get_current_question():
-    """Get the current question to answer"""
-    question = db.get_current_question()
+    """Get the current question to answer, and the ones queued after it"""
+    questions = db.get_upcoming_questions(1 + max(0, QUESTION_PREFETCH))
 
-    if question:
+    if questions:
         return jsonify({
             'success': True,
-            'question': question
+            'question': questions[0],
+            'upcoming': questions[1:]
         })
     else:
         return jsonify({
@@ -139,6 +253,20 @@ def get_current_question():
         })
 
 
+# Longest a synchronous /api/transcribe request waits before queueing the upload instead
+STT_SYNC_TIMEOUT = float(os.getenv("SPEECH_STT_SYNC_TIMEOUT", "30"))
+
+
+def _job_queued(job_id):
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/transcription-jobs/{job_id}',
+        'events_url': f'/api/transcription-jobs/{job_id}/events'
+    }), 202
+
+
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe_audio():
     """Transcribe audio through external OpenAI-compatible STT service."""
@@ -158,85 +286,130 @@ def transcribe_audio():
         if not db.question_exists(question_id_int):
             return jsonify({'success': False, 'error': 'Question not found'}), 404
 
-        # Save the audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-            audio_file.save(temp_audio.name)
-            temp_path = temp_audio.name
-
-        try:
-            print(f"Transcribing audio for question {question_id} via {STT_BASE_URL}...")
-            with open(temp_path, "rb") as audio_handle:
-                stt_resp = requests.post(
-                    f"{STT_BASE_URL}/audio/transcriptions",
-                    headers=_auth_headers(STT_API_KEY),
-                    files={"file": ("recording.wav", audio_handle, "audio/wav")},
-                    data={"model": STT_MODEL},
-                    timeout=120,
-                )
-            stt_resp.raise_for_status()
-            payload = stt_resp.json()
-            transcription = str(payload.get("text", "")).strip()
-            if not transcription:
-                raise RuntimeError("STT response did not include transcription text")
-
-            # Save to permanent location
-            audio_filename = f"response_{question_id_int}_{uuid4().hex}.wav"
-            audio_path = os.path.join(UPLOAD_DIR, audio_filename)
-            os.replace(temp_path, audio_path)
-
-            # Save to database
-            response_id = db.save_response(
-                question_id=question_id_int,
-                transcription=transcription,
-                audio_path=audio_path
-            )
-
-            return jsonify({
-                'success': True,
-                'transcription': transcription,
-                'response_id': response_id
-            })
+        if request.form.get('mode') == 'async':
+            # Persist the upload and return; the queue transcribes it later.
+            audio_path = audio_store.save(audio_file)
+            return _job_queued(transcription_queue.enqueue(question_id_int, audio_path))
+
+        # Synchronous mode holds this request thread for the STT call (only
+        # mode=async returns immediately), but never for longer than
+        # STT_SYNC_TIMEOUT: a slower transcription is handed to the job queue.
+        # The upload is already on disk in the store; it is sent to STT from
+        # there and only kept (renamed to its content address) on success.
+        with audio_store.staged_upload(audio_file) as staged:
+            print(f"Transcribing audio for question {question_id}...")
+            # The HTTP call runs on the shared speech event loop; this thread
+            # only waits on its future.
+            future = speech_runtime.submit(transcribe(staged.path))
+            try:
+                transcription = future.result(STT_SYNC_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                audio_path = audio_store.commit(staged)
+                print(f"Transcription for question {question_id} is slow; queued it as a job")
+                return _job_queued(transcription_queue.enqueue(question_id_int, audio_path))
+            audio_path = audio_store.commit(staged)
+
+        # Save to database
+        response_id = db.save_response(
+            question_id=question_id_int,
+            transcription=transcription,
+            audio_path=audio_path
+        )
+        response_saved(response_id)
 
-        finally:
-            # Clean up temp file if it still exists
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return jsonify({
+            'success': True,
+            'transcription': transcription,
+            'response_id': response_id
+        })
 
+    except (CircuitOpenError, BackendBusyError) as e:
+        print(f"STT backend unavailable: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         print(f"Error during transcription: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/speak', methods=['POST'])
+@app.route('/api/transcription-jobs/<int:job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Poll the status of a background transcription job"""
+    job = db.get_transcription_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/transcription-jobs/<int:job_id>/events', methods=['GET'])
+def transcription_job_events(job_id):
+    """Stream job status changes as Server-Sent Events until the job finishes"""
+    if not db.get_transcription_job(job_id):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    def generate():
+        last_state = None
+        while True:
+            # Read the version first so a change during the lookup isn't missed.
+            version = transcription_queue.version
+            job = db.get_transcription_job(job_id)
+            state = (job['status'], job['attempts'])
+            if state != last_state:
+                last_state = state
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in TERMINAL_STATUSES:
+                return
+            if not transcription_queue.wait_for_change(version, timeout=SSE_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/api/speak', methods=['GET', 'POST'])
 def speak_text():
-    """Synthesize text through external OpenAI-compatible TTS service."""
+    """Synthesize text through external OpenAI-compatible TTS service.
+
+    Cached audio is served from disk; GET requests (``?text=...&voice=...``)
+    support ETag revalidation and Range requests. On a miss, audio is relayed
+    to the client chunk by chunk as the TTS service produces it and written
+    to the cache on the way through.
+    """
     try:
-        data = request.get_json(silent=True) or {}
+        if request.method == 'GET':
+            data = request.args
+        else:
+            data = request.get_json(silent=True) or {}
         text = str(data.get("text", "")).strip()
         if not text:
             return jsonify({'success': False, 'error': 'No text provided'}), 400
 
         voice = str(data.get("voice") or TTS_VOICE)
-        tts_resp = requests.post(
-            f"{TTS_BASE_URL}/audio/speech",
-            headers={
-                **_auth_headers(TTS_API_KEY),
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": TTS_MODEL,
-                "input": text,
-                "voice": voice,
-                "response_format": TTS_RESPONSE_FORMAT,
-            },
-            timeout=120,
-        )
-        tts_resp.raise_for_status()
-        return Response(
-            tts_resp.content,
-            status=200,
-            mimetype=tts_resp.headers.get("Content-Type", "audio/mpeg"),
-        )
+        mimetype = TTSCache.mimetype_for(TTS_RESPONSE_FORMAT)
+        key = TTSCache.make_key(text, voice, TTS_MODEL, TTS_RESPONSE_FORMAT)
+        path = tts_cache.get(key, TTS_RESPONSE_FORMAT)
+        if path is not None:
+            return send_file(
+                path,
+                mimetype=mimetype,
+                conditional=True,
+                etag=key,
+                max_age=TTS_CACHE_MAX_AGE,
+            )
+
+        tts_resp = request_speech(tts_backend, text, voice)
+        chunks = tts_cache.write_through(key, TTS_RESPONSE_FORMAT, iter_speech_chunks(tts_resp))
+        response = Response(chunks, status=200, mimetype=mimetype, direct_passthrough=True)
+        response.set_etag(key)
+        response.cache_control.public = True
+        response.cache_control.max_age = TTS_CACHE_MAX_AGE
+        return response
+    except (CircuitOpenError, BackendBusyError) as e:
+        print(f"TTS backend unavailable: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         print(f"Error during text-to-speech: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -244,9 +417,20 @@ def speak_text():
 
 @app.route('/api/next-question', methods=['POST'])
 def next_question():
-    """Move to the next question"""
-    db.advance_to_next_question()
-    return jsonify({'success': True})
+    """Move past a question and return the next one
+
+    The client sends the id of the question it is moving past, so a
+    repeated request does not skip a second question.
+    """
+    data = request.get_json(silent=True) or {}
+    db.advance_to_next_question(data.get('question_id'))
+
+    questions = db.get_upcoming_questions(1 + max(0, QUESTION_PREFETCH))
+    return jsonify({
+        'success': True,
+        'question': questions[0] if questions else None,
+        'upcoming': questions[1:]
+    })
 
 
 @app.route('/api/stats', methods=['GET'])
@@ -259,19 +443,94 @@ def get_stats():
     })
 
 
+@app.route('/api/semantic-search', methods=['GET'])
+def semantic_search():
+    """Find responses closest in meaning to a query
+
+    Query params: q, k (number of results).
+    """
+    if semantic_indexer is None:
+        return jsonify({
+            'success': False,
+            'error': 'Semantic search is unavailable (install sentence-transformers)'
+        }), 503
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'No search query provided'}), 400
+
+    k = request.args.get('k', DEFAULT_SEARCH_PAGE_SIZE, type=int)
+    k = max(1, min(k, MAX_SEARCH_PAGE_SIZE))
+    return jsonify({
+        'success': True,
+        'results': semantic_indexer.search(query, k)
+    })
+
+
+@app.route('/api/speech-backends', methods=['GET'])
+def get_speech_backends():
+    """Get load, health and latency of each STT/TTS endpoint"""
+    return jsonify({
+        'success': True,
+        'stt': stt_backend.pool.snapshot(),
+        'tts': tts_backend.pool.snapshot()
+    })
+
+
 @app.route('/api/responses', methods=['GET'])
 def get_responses():
-    """Get all responses"""
-    question_id = request.args.get('question_id')
+    """Get responses, newest first, one keyset page at a time
 
-    if question_id:
-        responses = db.get_all_responses(int(question_id))
-    else:
-        responses = db.get_all_responses()
+    Query params: question_id, after_id (cursor from ``next_after_id``),
+    limit, and format=ndjson to stream every matching row instead.
+    """
+    question_id = request.args.get('question_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for row in db.iter_responses(question_id, after_id=after_id):
+                yield json.dumps(row) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', DEFAULT_RESPONSES_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_RESPONSES_PAGE_SIZE))
+    responses = db.get_all_responses(question_id, after_id=after_id, limit=limit)
+    next_after_id = responses[-1]['id'] if len(responses) == limit else None
 
     return jsonify({
         'success': True,
-        'responses': responses
+        'responses': responses,
+        'next_after_id': next_after_id
+    })
+
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Full-text search over transcriptions and questions, best matches first
+
+    Query params: q, type (response or question; default both), limit, offset.
+    Snippets wrap matched terms in <mark> tags; the surrounding text is not
+    HTML-escaped.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'No search query provided'}), 400
+
+    kind = request.args.get('type') or None
+    if kind not in (None, 'response', 'question'):
+        return jsonify({'success': False, 'error': 'Invalid type'}), 400
+
+    limit = request.args.get('limit', DEFAULT_SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    results = db.search(query, kind=kind, limit=limit, offset=offset)
+
+    return jsonify({
+        'success': True,
+        'results': results,
+        'next_offset': offset + limit if len(results) == limit else None
     })
 
 
@@ -307,15 +566,35 @@ def reset_progress():
     return jsonify({'success': True, 'message': 'Progress reset'})
 
 
+def start_background_work():
+    """Resume transcription jobs left by a previous process and index missed responses"""
+    resumed = transcription_queue.resume_pending()
+    if resumed:
+        print(f"Resumed {resumed} pending transcription jobs")
+    # Embed anything saved while the server was down.
+    response_saved()
+
+
+# `python app.py` runs the debug reloader unless FLASK_RELOADER=0
+USE_RELOADER = os.getenv("FLASK_RELOADER", "1") != "0"
+
+# Every process that serves requests (gunicorn workers, the reloader's child,
+# python app.py without the reloader) resumes background work; only the
+# reloader's parent, which just watches files, does not. Jobs are claimed
+# atomically, so several workers resuming at once do not run a job twice.
+if not (__name__ == '__main__' and USE_RELOADER and os.environ.get("WERKZEUG_RUN_MAIN") != "true"):
+    start_background_work()
+
+
 if __name__ == '__main__':
     ensure_questions_seeded()
     print("\n" + "="*60)
     print("ProjectSelf - Knowledge Capture System")
     print("="*60)
     print("\nServer starting on http://localhost:5000")
-    print(f"STT backend: {STT_BASE_URL} (model={STT_MODEL})")
-    print(f"TTS backend: {TTS_BASE_URL} (model={TTS_MODEL}, voice={TTS_VOICE})")
+    print(f"STT backend: {describe_endpoints(STT_ENDPOINTS)} (model={STT_MODEL})")
+    print(f"TTS backend: {describe_endpoints(TTS_ENDPOINTS)} (model={TTS_MODEL}, voice={TTS_VOICE})")
     print("\nReady to capture your knowledge and wisdom!")
     print("="*60 + "\n")
 
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True, use_reloader=USE_RELOADER)
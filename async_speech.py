@@ -0,0 +1,74 @@
+"""
+Background asyncio runtime for calls to the external speech services.
+
+One event loop runs in a daemon thread and owns a single httpx.AsyncClient, so
+every in-flight STT request shares pooled keep-alive connections and is
+multiplexed on that loop instead of pinning a blocking socket per call. Flask
+views hand work to the loop with ``submit()`` and wait on the returned future;
+speech_client.AsyncSpeechBackend issues the actual requests.
+"""
+
+import asyncio
+import threading
+
+import httpx
+
+
+class AsyncSpeechRuntime:
+    """Lazily started event loop thread plus a shared async HTTP client"""
+
+    def __init__(self, timeout=httpx.Timeout(120.0, connect=5.0), max_connections=100):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                )
+                ready.set()
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name='speech-runtime', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the runtime loop; returns a concurrent Future"""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the runtime loop and wait for its result"""
+        return self.submit(coro).result(timeout)
+
+    @property
+    def client(self):
+        return self._client
+
+    def close(self):
+        """Close the HTTP client and stop the loop"""
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(5)
+            self._loop = None
+            self._thread = None
+            self._client = None
@@ -0,0 +1,184 @@
+"""
+Content-addressed storage for uploaded response audio.
+
+Uploads are written once, straight into the store directory, and hashed as the
+bytes arrive. Committing an upload is a rename to ``<sha256[:2]>/<sha256><ext>``
+on the same filesystem, so the audio is never copied after it is received, and
+identical uploads share one file.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+COPY_CHUNK_SIZE = 64 * 1024
+DEFAULT_EXTENSION = '.wav'
+STALE_UPLOAD_SECONDS = 60 * 60
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StagedUpload:
+    """Writable file in the store directory that hashes what is written to it
+
+    Used as the stream behind a Werkzeug FileStorage. Unless it is committed,
+    the file is deleted when closed.
+    """
+
+    def __init__(self, directory, extension):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix=extension)
+        self.extension = extension
+        self.committed = False
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        # read/seek/tell/flush/etc. go to the underlying file.
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AudioStore:
+    """Directory of uploaded audio addressed by content hash"""
+
+    def __init__(self, root='uploads'):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_stale_uploads()
+
+    def _remove_stale_uploads(self):
+        """Delete staging files left behind by an interrupted upload
+
+        Only old ones: another process sharing the store may be mid-upload.
+        """
+        cutoff = time.time() - STALE_UPLOAD_SECONDS
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith('.upload-') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    @staticmethod
+    def extension_for(filename):
+        extension = os.path.splitext(filename or '')[1].lower()
+        if not extension or len(extension) > 6 or not extension[1:].isalnum():
+            return DEFAULT_EXTENSION
+        return extension
+
+    def path_for(self, digest, extension=DEFAULT_EXTENSION):
+        # Two-character shards keep directories small.
+        return os.path.join(self.root, digest[:2], f'{digest}{extension}')
+
+    def contains(self, path):
+        """Whether path lies inside this store"""
+        root = os.path.abspath(self.root)
+        return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+    def is_canonical(self, path):
+        """Whether path is already at its content address in this store
+
+        Judged from the name alone; the contents are not rehashed.
+        """
+        stem, extension = os.path.splitext(os.path.basename(path))
+        return (len(stem) == 64 and
+                os.path.abspath(path) == os.path.abspath(self.path_for(stem, extension)))
+
+    def adopt(self, path, extension=None):
+        """Place a copy of an existing file at its content address; returns the new path
+
+        The source is left in place so callers can repoint references before
+        removing it. Within one filesystem the copy is a hard link.
+        """
+        path_extension = os.path.splitext(path)[1]
+        dest = self.path_for(file_digest(path), extension or path_extension or DEFAULT_EXTENSION)
+        if os.path.exists(dest):
+            return dest
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.link(path, dest)
+        except OSError:
+            # Different filesystem (e.g. a cold storage mount): copy, then rename into place.
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+            try:
+                with os.fdopen(fd, 'wb') as dst, open(path, 'rb') as src:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                os.replace(tmp_path, dest)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return dest
+
+    def stage(self, filename=None):
+        """Open a new staged upload for a file named filename"""
+        return StagedUpload(self.root, self.extension_for(filename))
+
+    def commit(self, staged):
+        """Move a fully written staged upload to its content address; returns the path"""
+        staged.flush()
+        path = self.path_for(staged.hexdigest(), staged.extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # Same bytes already stored; let close() discard the duplicate.
+            return path
+        os.replace(staged.path, path)
+        staged.committed = True
+        return path
+
+    def staged_upload(self, file_storage):
+        """Return the StagedUpload behind an uploaded FileStorage
+
+        Uploads parsed by UploadRequest already live in the store directory;
+        any other stream is copied in once.
+        """
+        stream = file_storage.stream
+        if isinstance(stream, StagedUpload):
+            stream.flush()
+            return stream
+
+        staged = self.stage(file_storage.filename)
+        while True:
+            chunk = stream.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            staged.write(chunk)
+        staged.flush()
+        return staged
+
+    def save(self, file_storage):
+        """Store an uploaded FileStorage and return its path"""
+        with self.staged_upload(file_storage) as staged:
+            return self.commit(staged)
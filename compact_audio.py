@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Compact stored response audio
+
+Transcodes recordings to Opus with ffmpeg, files them under the content-hashed
+shard layout of the audio store (``<sha[:2]>/<sha>.opus``), and optionally
+moves audio that has not been used for a number of days to a cold storage
+directory. Each file is written to its new location first, then every
+``audio_path`` pointing at it is updated in a single transaction, and only
+then is the old file removed, so an interrupted run never leaves a response
+pointing at a missing file.
+
+Run once, or keep it running in the background with --loop.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from audio_store import AudioStore
+from database import KnowledgeDB
+
+OPUS_EXTENSION = '.opus'
+DEFAULT_BITRATE = os.getenv('AUDIO_OPUS_BITRATE', '24k')
+STALE_TEMP_SECONDS = 60 * 60
+
+
+def transcode_to_opus(src, dest, bitrate=DEFAULT_BITRATE):
+    """Transcode src to an Opus file at dest with ffmpeg"""
+    result = subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', src,
+         '-vn', '-c:a', 'libopus', '-b:a', bitrate, '-application', 'voip', '-f', 'ogg', dest],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip()
+                           or f'ffmpeg exited with status {result.returncode}')
+
+
+def remove_stale_temp_files(store):
+    """Delete transcode outputs left behind by an interrupted run"""
+    cutoff = time.time() - STALE_TEMP_SECONDS
+    for name in os.listdir(store.root):
+        path = os.path.join(store.root, name)
+        if name.startswith('.compact-') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def compact_file(path, target, bitrate=DEFAULT_BITRATE):
+    """Place path's audio, as Opus, at its content address in target; returns the new path"""
+    if path.endswith(OPUS_EXTENSION):
+        # Already Opus; only its location changes.
+        return target.adopt(path, OPUS_EXTENSION)
+
+    fd, tmp_path = tempfile.mkstemp(dir=target.root, prefix='.compact-', suffix=OPUS_EXTENSION)
+    os.close(fd)
+    try:
+        transcode_to_opus(path, tmp_path, bitrate)
+        return target.adopt(tmp_path, OPUS_EXTENSION)
+    finally:
+        os.remove(tmp_path)
+
+
+def compact(db, hot, cold=None, cold_after_days=None, bitrate=DEFAULT_BITRATE):
+    """Run one compaction pass over every stored response audio file"""
+    counts = {'transcoded': 0, 'moved': 0, 'archived': 0, 'missing': 0, 'busy': 0, 'failed': 0}
+    bytes_before = bytes_after = 0
+
+    cutoff = None
+    if cold is not None and cold_after_days is not None:
+        # created_at is stored as UTC 'YYYY-MM-DD HH:MM:SS', which sorts as text.
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=cold_after_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    for row in db.iter_audio_files():
+        path = row['audio_path']
+        if not os.path.exists(path):
+            counts['missing'] += 1
+            continue
+
+        in_cold = cold is not None and cold.contains(path)
+        archive = not in_cold and cutoff is not None and (row['last_used'] or '') < cutoff
+        target = cold if in_cold or archive else hot
+        if path.endswith(OPUS_EXTENSION) and target.is_canonical(path):
+            continue
+
+        try:
+            size = os.path.getsize(path)
+            new_path = compact_file(path, target, bitrate)
+        except Exception as e:
+            print(f"  Could not compact {path}: {str(e)}")
+            counts['failed'] += 1
+            continue
+
+        if new_path == path:
+            continue
+        if not db.relocate_audio(path, new_path):
+            # A queued transcription still reads the original; try again next pass.
+            counts['busy'] += 1
+            continue
+        os.remove(path)
+
+        bytes_before += size
+        bytes_after += os.path.getsize(new_path)
+        if archive:
+            counts['archived'] += 1
+        elif path.endswith(OPUS_EXTENSION):
+            counts['moved'] += 1
+        else:
+            counts['transcoded'] += 1
+
+    counts['bytes_saved'] = bytes_before - bytes_after
+    return counts
+
+
+def print_summary(counts):
+    print(f"✓ Transcoded {counts['transcoded']}, moved {counts['moved']}, "
+          f"archived {counts['archived']} audio files "
+          f"({counts['bytes_saved'] / (1024 * 1024):.1f} MB saved)")
+    if counts['missing']:
+        print(f"  {counts['missing']} referenced files were missing")
+    if counts['busy']:
+        print(f"  {counts['busy']} files are awaiting transcription and were left in place")
+    if counts['failed']:
+        print(f"  {counts['failed']} files could not be transcoded")
+
+
+def run(upload_dir='uploads', cold_dir=None, cold_after_days=None, bitrate=DEFAULT_BITRATE, loop=None):
+    """Compact once, or every loop seconds until interrupted"""
+    try:
+        if shutil.which('ffmpeg') is None:
+            print("Error: ffmpeg not found on PATH. Install ffmpeg to compact audio.")
+            sys.exit(1)
+
+        db = KnowledgeDB()
+        hot = AudioStore(upload_dir)
+        cold = AudioStore(cold_dir) if cold_dir else None
+
+        while True:
+            for store in filter(None, (hot, cold)):
+                remove_stale_temp_files(store)
+            print_summary(compact(db, hot, cold, cold_after_days, bitrate))
+            if not loop:
+                break
+            time.sleep(loop)
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Transcode, shard and tier stored response audio')
+    parser.add_argument('--upload-dir', default='uploads', help='Audio store used by the app (default: uploads/)')
+    parser.add_argument('--bitrate', default=DEFAULT_BITRATE,
+                        help=f'Opus bitrate (default: {DEFAULT_BITRATE}, or AUDIO_OPUS_BITRATE)')
+    parser.add_argument('--cold-dir', help='Cold storage directory for old audio')
+    parser.add_argument('--cold-after-days', type=float,
+                        help='Move audio not used for this many days to --cold-dir')
+    parser.add_argument('--loop', type=float, metavar='SECONDS',
+                        help='Keep running, compacting again every SECONDS')
+    args = parser.parse_args()
+
+    if (args.cold_dir is None) != (args.cold_after_days is None):
+        parser.error('--cold-dir and --cold-after-days must be given together')
+
+    run(args.upload_dir, args.cold_dir, args.cold_after_days, args.bitrate, args.loop)
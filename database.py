@@ -1,140 +1,399 @@
+import hashlib
+import itertools
+import queue
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
+from question_scheduler import DEFAULT_CATEGORY_SPACING, schedule_questions
 
-class KnowledgeDB:
-    def __init__(self, db_path='knowledge.db'):
+# Pragmas applied to every pooled connection. WAL lets readers proceed while a
+# writer is active; NORMAL sync is durable across application crashes in WAL
+# mode and avoids an fsync per commit.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',     # ~16 MB page cache per connection
+    'PRAGMA mmap_size = 268435456',   # 256 MB memory-mapped I/O
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Highlight markers placed around matched terms in search snippets
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+SNIPPET_TOKENS = 16
+
+# Compiled statements kept per connection; reused across calls because the
+# connections themselves are long-lived.
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    A thread borrows one connection for the duration of a ``connection()``
+    block; nested blocks on the same thread reuse it, so a method that calls
+    another method does not check out a second connection.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=30.0):
         self.db_path = db_path
-        self.init_db()
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
 
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
 
-    def init_db(self):
-        """Initialize the database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
 
-        # Questions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question_text TEXT NOT NULL,
-                category TEXT,
-                order_index INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
 
-        # Responses table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question_id INTEGER NOT NULL,
-                audio_path TEXT,
-                transcription TEXT,
-                duration_seconds REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (question_id) REFERENCES questions (id)
-            )
-        ''')
+        if can_create:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
 
-        # Metadata table for tracking progress
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS session_metadata (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                current_question_index INTEGER DEFAULT 0,
-                total_responses INTEGER DEFAULT 0,
-                last_session_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError('Timed out waiting for a database connection')
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool afterwards"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+def normalize_question_text(text):
+    """Canonical form used to detect duplicate questions"""
+    return ' '.join(str(text).lower().split())
+
+
+def question_text_hash(text):
+    """Stable hash of the normalized question text"""
+    return hashlib.sha1(normalize_question_text(text).encode('utf-8')).hexdigest()
+
+
+def _score(value):
+    """A processor score as a float, or None if missing or not a number"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _question_rows(questions):
+    """Yield (text, category, text_hash, priority_score, alignment_score) for each valid question record"""
+    for q in questions:
+        question_text = q if isinstance(q, str) else q.get('question', q.get('text', ''))
+        question_text = str(question_text).strip()
+        category = q.get('category', 'General') if isinstance(q, dict) else 'General'
+
+        if not question_text:
+            continue
+
+        if isinstance(q, dict):
+            scores = _score(q.get('priority_score')), _score(q.get('alignment_score'))
+        else:
+            scores = None, None
+
+        yield (question_text, category, question_text_hash(question_text)) + scores
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word, the last as a prefix
+
+    Words are quoted, so punctuation and FTS5 operators in user input are
+    treated as plain text rather than query syntax.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _batched(iterable, size):
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class KnowledgeDB:
+    def __init__(self, db_path='knowledge.db', pool_size=8, category_spacing=DEFAULT_CATEGORY_SPACING):
+        self.db_path = db_path
+        self.category_spacing = category_spacing
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        self.init_db()
+
+    def get_connection(self):
+        """Borrow a pooled connection (use as a context manager)"""
+        return self.pool.connection()
+
+    def close(self):
+        """Release pooled connections"""
+        self.pool.close()
+
+    def init_db(self):
+        """Initialize the database, applying any pending schema migrations"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-read inside the write lock so concurrent processes don't
+                # apply the same migration twice.
+                version = cursor.execute('PRAGMA user_version').fetchone()[0]
+                for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                    migration(cursor)
+                    cursor.execute(f'PRAGMA user_version = {number}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
 
-        # Initialize metadata if not exists
-        cursor.execute('SELECT COUNT(*) as count FROM session_metadata')
-        if cursor.fetchone()['count'] == 0:
-            cursor.execute('INSERT INTO session_metadata (current_question_index) VALUES (0)')
+    def schema_version(self):
+        """Return the number of applied schema migrations"""
+        with self.get_connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
 
-        conn.commit()
-        conn.close()
+    def import_questions(self, questions_list, batch_size=500, dedupe=True):
+        """Import questions into the database in one transaction
 
-    def import_questions(self, questions_list):
-        """Import a list of questions into the database
+        New questions are scheduled by priority among themselves and added
+        to the end of the upcoming-question queue; rebuild_question_queue
+        merges them with the rest.
 
         Args:
-            questions_list: List of dicts with 'question', optional 'category'
-        """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+            questions_list: Iterable of strings or dicts with 'question'
+                (or 'text') and optional 'category', 'priority_score' and
+                'alignment_score'; it is consumed lazily
+            batch_size: Rows written per executemany call
+            dedupe: Skip questions whose normalized text is already stored
 
-        cursor.execute('SELECT COALESCE(MAX(order_index), -1) as max_order FROM questions')
-        start_index = cursor.fetchone()['max_order'] + 1
-        imported_count = 0
+        Returns:
+            Number of questions inserted
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('SELECT COALESCE(MAX(order_index), -1) as max_order FROM questions')
+                next_index = first_index = cursor.fetchone()['max_order'] + 1
+                imported_count = 0
 
-        for q in questions_list:
-            question_text = q if isinstance(q, str) else q.get('question', q.get('text', ''))
-            question_text = str(question_text).strip()
-            category = q.get('category', 'General') if isinstance(q, dict) else 'General'
+                for batch in _batched(_question_rows(questions_list), batch_size):
+                    if dedupe:
+                        batch = self._drop_known_questions(cursor, batch)
+                    cursor.executemany('''
+                        INSERT INTO questions (question_text, category, text_hash, priority_score,
+                                               alignment_score, order_index)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', [row + (next_index + offset,) for offset, row in enumerate(batch)])
+                    next_index += len(batch)
+                    imported_count += len(batch)
 
-            if not question_text:
-                continue
+                cursor.execute('''
+                    UPDATE session_metadata
+                    SET total_questions = total_questions + ?
+                    WHERE id = 1
+                ''', (imported_count,))
 
-            cursor.execute('''
-                INSERT INTO questions (question_text, category, order_index)
-                VALUES (?, ?, ?)
-            ''', (question_text, category, start_index + imported_count))
-            imported_count += 1
+                if imported_count:
+                    _append_to_question_queue(cursor, self.category_spacing, first_index)
 
-        conn.commit()
-        conn.close()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
         return imported_count
 
+    @staticmethod
+    def _drop_known_questions(cursor, batch):
+        """Filter a batch down to rows whose text hash is new to the table and batch"""
+        unique = {}
+        for row in batch:
+            unique.setdefault(row[2], row)
+
+        hashes = list(unique)
+        placeholders = ','.join('?' * len(hashes))
+        cursor.execute(
+            f'SELECT text_hash FROM questions WHERE text_hash IN ({placeholders})', hashes
+        )
+        for existing in cursor.fetchall():
+            unique.pop(existing['text_hash'], None)
+        return list(unique.values())
+
     def get_question_by_index(self, index):
         """Get a question by its order index"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT id, question_text, category, order_index
-            FROM questions
-            WHERE order_index = ?
-            ORDER BY id ASC
-            LIMIT 1
-        ''', (index,))
+            cursor.execute('''
+                SELECT id, question_text, category, order_index
+                FROM questions
+                WHERE order_index = ?
+                ORDER BY id ASC
+                LIMIT 1
+            ''', (index,))
 
-        row = cursor.fetchone()
-        conn.close()
+            row = cursor.fetchone()
 
         if row:
             return dict(row)
         return None
 
+    def get_questions(self, after_index=-1, limit=None):
+        """Get questions in order_index order, starting after after_index"""
+        sql = '''
+            SELECT id, question_text, category, order_index
+            FROM questions
+            WHERE order_index > ?
+            ORDER BY order_index ASC, id ASC
+        '''
+        params = [after_index]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self.get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def iter_questions(self, batch_size=500):
+        """Yield every question in order, one keyset page at a time"""
+        after_index = -1
+        while True:
+            page = self.get_questions(after_index, limit=batch_size)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_index = page[-1]['order_index']
+
     def get_current_question(self):
         """Get the current question based on session progress"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT current_question_index FROM session_metadata WHERE id = 1')
-        index = cursor.fetchone()['current_question_index']
+        upcoming = self.get_upcoming_questions(1)
+        return upcoming[0] if upcoming else None
 
-        question = self.get_question_by_index(index)
+    def get_upcoming_questions(self, limit=1):
+        """The current question followed by the next ones in the queue
 
-        # Also get total count
-        cursor.execute('SELECT COUNT(*) as total FROM questions')
-        total = cursor.fetchone()['total']
+        Each carries ``current_index``, its position in the session. Queued
+        questions answered since the queue was built are dropped on the way.
+        """
+        while True:
+            with self.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT q.id, q.question_text, q.category, q.order_index,
+                           q.priority_score, q.alignment_score,
+                           m.current_question_index, m.total_questions,
+                           EXISTS (
+                               SELECT 1 FROM responses r
+                               WHERE r.question_id = q.id AND r.id > m.queue_watermark
+                           ) AS answered
+                    FROM session_metadata m
+                    CROSS JOIN question_queue qq
+                    JOIN questions q ON q.id = qq.question_id
+                    WHERE m.id = 1
+                    ORDER BY qq.position
+                    LIMIT ?
+                ''', (limit,)).fetchall()
 
-        conn.close()
+                answered = [row['id'] for row in rows if row['answered']]
+                if not answered:
+                    break
+                self._dequeue(conn, answered)
 
-        if question:
-            question['current_index'] = index
-            question['total_questions'] = total
+        questions = []
+        for offset, row in enumerate(rows):
+            question = dict(row)
+            del question['answered']
+            question['current_index'] = question.pop('current_question_index') + offset
+            questions.append(question)
+        return questions
 
-        return question
+    @staticmethod
+    def _dequeue(conn, question_ids):
+        """Remove questions from the queue, counting each as moved past"""
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(question_ids))
+            cursor.execute(f'DELETE FROM question_queue WHERE question_id IN ({placeholders})', question_ids)
+            cursor.execute('''
+                UPDATE session_metadata
+                SET current_question_index = current_question_index + ?
+                WHERE id = 1
+            ''', (cursor.rowcount,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
     def save_response(self, question_id, transcription, audio_path=None, duration=None):
         """Save a transcribed response"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            response_id = self._insert_response(cursor, question_id, transcription, audio_path, duration)
+            conn.commit()
+
+        return response_id
 
+    @staticmethod
+    def _insert_response(cursor, question_id, transcription, audio_path=None, duration=None):
+        """Insert a response row and bump the response counter"""
         cursor.execute('''
             INSERT INTO responses (question_id, transcription, audio_path, duration_seconds)
             VALUES (?, ?, ?, ?)
@@ -150,89 +409,658 @@ class KnowledgeDB:
             WHERE id = 1
         ''')
 
-        conn.commit()
-        conn.close()
+        return response_id
+
+    def create_transcription_job(self, question_id, audio_path):
+        """Record an uploaded answer awaiting transcription; returns the job id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO transcription_jobs (question_id, audio_path)
+                VALUES (?, ?)
+            ''', (question_id, audio_path))
+            job_id = cursor.lastrowid
+            conn.commit()
+
+        return job_id
+
+    def get_transcription_job(self, job_id):
+        """Get a transcription job by ID"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT * FROM transcription_jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+
+        if row:
+            return dict(row)
+        return None
+
+    def get_unfinished_transcription_jobs(self):
+        """Get queued or interrupted jobs, oldest first"""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM transcription_jobs
+                WHERE status IN ('queued', 'running')
+                ORDER BY id ASC
+            ''').fetchall()
+
+        return [dict(row) for row in rows]
+
+    def start_transcription_job(self, job_id, attempts):
+        """Mark a job as running and count the attempt
+
+        attempts is the count the caller read; if another process has
+        started the job since, nothing changes and False is returned.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE transcription_jobs
+                SET status = 'running',
+                    attempts = attempts + 1,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND attempts = ? AND status NOT IN ('done', 'failed')
+            ''', (job_id, attempts))
+            conn.commit()
+        return cursor.rowcount == 1
+
+    def complete_transcription_job(self, job_id, transcription):
+        """Save the job's response and mark it done in one transaction"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            job = cursor.execute(
+                'SELECT question_id, audio_path FROM transcription_jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+            response_id = self._insert_response(
+                cursor, job['question_id'], transcription, audio_path=job['audio_path']
+            )
+            cursor.execute('''
+                UPDATE transcription_jobs
+                SET status = 'done',
+                    transcription = ?,
+                    response_id = ?,
+                    error = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (transcription, response_id, job_id))
+            conn.commit()
 
         return response_id
 
+    def fail_transcription_job(self, job_id, error, retry=False):
+        """Record a failed attempt, leaving the job queued if it will be retried"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                UPDATE transcription_jobs
+                SET status = ?,
+                    error = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', ('queued' if retry else 'failed', error, job_id))
+            conn.commit()
+
+    def get_audio_files(self, after_path=None, limit=500):
+        """Get distinct response audio paths in path order, one page at a time
+
+        Each row carries the newest ``created_at`` of the responses sharing
+        the file, so callers can tell when it was last used.
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT audio_path, MAX(created_at) AS last_used, COUNT(*) AS response_count
+                FROM responses
+                WHERE audio_path IS NOT NULL AND audio_path > ?
+                GROUP BY audio_path
+                ORDER BY audio_path
+                LIMIT ?
+            ''', (after_path or '', limit)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def iter_audio_files(self, batch_size=500):
+        """Yield every distinct response audio path, fetched in batches"""
+        after_path = None
+        while True:
+            batch = self.get_audio_files(after_path=after_path, limit=batch_size)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after_path = batch[-1]['audio_path']
+
+    def relocate_audio(self, old_path, new_path):
+        """Repoint every reference to an audio file in one transaction
+
+        Returns False, changing nothing, while a queued or running
+        transcription job still needs the file at old_path.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                busy = cursor.execute('''
+                    SELECT 1 FROM transcription_jobs
+                    WHERE audio_path = ? AND status IN ('queued', 'running')
+                    LIMIT 1
+                ''', (old_path,)).fetchone()
+                if busy:
+                    conn.rollback()
+                    return False
+
+                cursor.execute('UPDATE responses SET audio_path = ? WHERE audio_path = ?',
+                               (new_path, old_path))
+                cursor.execute('UPDATE transcription_jobs SET audio_path = ? WHERE audio_path = ?',
+                               (new_path, old_path))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return True
+
+    def search(self, query, kind=None, limit=20, offset=0):
+        """Full-text search over transcriptions and question text, best matches first
+
+        Args:
+            query: Free text; every word must match, the last one as a prefix
+            kind: 'response' or 'question' to search only one of them
+            limit: Maximum number of hits to return
+            offset: Hits to skip, for paging
+
+        Each hit has ``type``, ``id``, ``question_id``, ``question_text``,
+        ``category``, a ``snippet`` with matches wrapped in <mark> tags, and a
+        BM25 ``score`` (higher is better). Response hits also carry
+        ``transcription`` and ``created_at``.
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+
+        # Each side is ranked and cut inside FTS5 before joining, so only the
+        # top rows are ever looked up in the base tables.
+        window = limit + offset
+        selects = []
+        params = []
+        if kind in (None, 'response'):
+            selects.append('''
+                SELECT 'response' AS type, r.id, r.question_id, q.question_text, q.category,
+                       r.transcription, r.created_at, m.snippet, m.rank
+                FROM (
+                    SELECT rowid, rank,
+                           snippet(responses_fts, 0, ?, ?, '…', ?) AS snippet
+                    FROM responses_fts
+                    WHERE responses_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ) m
+                JOIN responses r ON r.id = m.rowid
+                JOIN questions q ON q.id = r.question_id
+            ''')
+            params += [SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS, match, window]
+        if kind in (None, 'question'):
+            selects.append('''
+                SELECT 'question' AS type, q.id, q.id AS question_id, q.question_text, q.category,
+                       NULL AS transcription, NULL AS created_at, m.snippet, m.rank
+                FROM (
+                    SELECT rowid, rank,
+                           snippet(questions_fts, 0, ?, ?, '…', ?) AS snippet
+                    FROM questions_fts
+                    WHERE questions_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ) m
+                JOIN questions q ON q.id = m.rowid
+            ''')
+            params += [SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS, match, window]
+        if not selects:
+            raise ValueError(f'Unknown search kind: {kind}')
+
+        sql = ' UNION ALL '.join(f'SELECT * FROM ({select})' for select in selects)
+        sql += ' ORDER BY rank LIMIT ? OFFSET ?'
+        params += [limit, offset]
+
+        with self.get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        hits = []
+        for row in rows:
+            hit = dict(row)
+            # bm25() is negative, with the best match lowest.
+            hit['score'] = round(-hit.pop('rank'), 4)
+            if hit['type'] == 'question':
+                del hit['transcription'], hit['created_at']
+            hits.append(hit)
+        return hits
+
     def question_exists(self, question_id):
         """Check if a question exists by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM questions WHERE id = ? LIMIT 1', (question_id,))
-        exists = cursor.fetchone() is not None
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM questions WHERE id = ? LIMIT 1', (question_id,))
+            exists = cursor.fetchone() is not None
         return exists
 
-    def advance_to_next_question(self):
-        """Move to the next question"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def advance_to_next_question(self, question_id=None):
+        """Move past a question (by default the current one) to the next
 
-        cursor.execute('''
-            UPDATE session_metadata
-            SET current_question_index = current_question_index + 1
-            WHERE id = 1
-        ''')
+        Passing the id of the question being shown makes repeated requests
+        harmless: once it has left the queue, nothing more happens.
+        """
+        with self.get_connection() as conn:
+            if question_id is None:
+                row = conn.execute('''
+                    SELECT question_id FROM question_queue ORDER BY position LIMIT 1
+                ''').fetchone()
+                if row is None:
+                    return
+                question_id = row['question_id']
+            self._dequeue(conn, [question_id])
 
-        conn.commit()
-        conn.close()
+    def rebuild_question_queue(self):
+        """Reschedule all queued questions together, e.g. after imports or changing category_spacing"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                _fill_question_queue(cursor, self.category_spacing)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
 
-    def get_all_responses(self, question_id=None):
-        """Get all responses, optionally filtered by question"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_all_responses(self, question_id=None, after_id=None, limit=None):
+        """Get responses newest first, optionally filtered by question
+
+        Args:
+            question_id: Only return responses to this question
+            after_id: Keyset cursor; return responses that sort after this
+                response id (i.e. older ones)
+            limit: Maximum number of rows to return
+        """
+        conditions = []
+        params = []
 
         if question_id:
-            cursor.execute('''
-                SELECT r.*, q.question_text, q.category
-                FROM responses r
-                JOIN questions q ON r.question_id = q.id
-                WHERE r.question_id = ?
-                ORDER BY r.created_at DESC
-            ''', (question_id,))
-        else:
-            cursor.execute('''
+            conditions.append('r.question_id = ?')
+            params.append(question_id)
+        if after_id is not None:
+            conditions.append(
+                '(r.created_at, r.id) < (SELECT created_at, id FROM responses WHERE id = ?)'
+            )
+            params.append(after_id)
+
+        sql = '''
+            SELECT r.*, q.question_text, q.category
+            FROM responses r
+            JOIN questions q ON r.question_id = q.id
+        '''
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY r.created_at DESC, r.id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self.get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def iter_responses(self, question_id=None, after_id=None, batch_size=500):
+        """Yield responses newest first, one keyset page at a time
+
+        Each page is fetched on a short-lived connection checkout, so memory
+        stays bounded by batch_size and no read snapshot is held between pages.
+        """
+        while True:
+            page = self.get_all_responses(question_id, after_id=after_id, limit=batch_size)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1]['id']
+
+    def get_responses_since(self, since_id=0, limit=None):
+        """Get responses with id greater than since_id, oldest first
+
+        Response ids only ever increase, so the last id returned is a
+        watermark for the next incremental read.
+        """
+        sql = '''
+            SELECT r.*, q.question_text, q.category
+            FROM responses r
+            JOIN questions q ON r.question_id = q.id
+            WHERE r.id > ?
+            ORDER BY r.id ASC
+        '''
+        params = [since_id]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self.get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def iter_responses_since(self, since_id=0, batch_size=500):
+        """Yield responses newer than since_id, oldest first, page by page"""
+        while True:
+            page = self.get_responses_since(since_id, limit=batch_size)
+            yield from page
+            if len(page) < batch_size:
+                return
+            since_id = page[-1]['id']
+
+    def get_responses_by_ids(self, response_ids):
+        """Get the responses with the given ids (in no particular order)"""
+        response_ids = list(response_ids)
+        if not response_ids:
+            return []
+
+        placeholders = ', '.join('?' * len(response_ids))
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
                 SELECT r.*, q.question_text, q.category
                 FROM responses r
                 JOIN questions q ON r.question_id = q.id
-                ORDER BY r.created_at DESC
-            ''')
-
-        rows = cursor.fetchall()
-        conn.close()
+                WHERE r.id IN ({placeholders})
+            ''', response_ids).fetchall()
 
         return [dict(row) for row in rows]
 
     def get_stats(self):
         """Get overall statistics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT total_questions, total_responses, current_question_index
+                FROM session_metadata
+                WHERE id = 1
+            ''').fetchone()
 
-        cursor.execute('SELECT COUNT(*) as total FROM questions')
-        total_questions = cursor.fetchone()['total']
-
-        cursor.execute('SELECT COUNT(*) as total FROM responses')
-        total_responses = cursor.fetchone()['total']
-
-        cursor.execute('SELECT current_question_index FROM session_metadata WHERE id = 1')
-        current_index = cursor.fetchone()['current_question_index']
-
-        conn.close()
+        total_questions = row['total_questions']
+        total_responses = row['total_responses']
 
         return {
             'total_questions': total_questions,
             'total_responses': total_responses,
-            'current_question_index': current_index,
+            'current_question_index': row['current_question_index'],
             'completion_percentage': (total_responses / total_questions * 100) if total_questions > 0 else 0
         }
 
     def reset_progress(self):
-        """Reset the current question index to start over"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Start over: queue every question again, answered or not"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('UPDATE session_metadata SET current_question_index = 0 WHERE id = 1')
+                _fill_question_queue(cursor, self.category_spacing, restart=True)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+
+def _fill_question_queue(cursor, category_spacing=DEFAULT_CATEGORY_SPACING, restart=False):
+    """Replace the upcoming-question queue with a freshly scheduled one
+
+    The questions still queued are rescheduled; ones answered since the queue
+    was last built are dropped and the question at the head stays first, so
+    the one on screen does not change. With restart, every question is queued
+    again, answered or not. Responses saved after this point make their
+    questions drop out of the queue when reached.
+    """
+    current = None
+    if restart:
+        questions = cursor.execute('''
+            SELECT id, category, order_index, priority_score, alignment_score
+            FROM questions
+        ''').fetchall()
+    else:
+        current = cursor.execute('''
+            SELECT question_id FROM question_queue ORDER BY position LIMIT 1
+        ''').fetchone()
+        questions = cursor.execute('''
+            SELECT id, category, order_index, priority_score, alignment_score
+            FROM questions q
+            WHERE id IN (SELECT question_id FROM question_queue)
+              AND NOT EXISTS (
+                  SELECT 1 FROM responses r
+                  WHERE r.question_id = q.id
+                    AND r.id > (SELECT queue_watermark FROM session_metadata WHERE id = 1)
+              )
+        ''').fetchall()
+
+    order = [q['id'] for q in schedule_questions([dict(q) for q in questions], category_spacing)]
+    if current is not None and current['question_id'] in order:
+        order.remove(current['question_id'])
+        order.insert(0, current['question_id'])
+
+    cursor.execute('DELETE FROM question_queue')
+    cursor.executemany('INSERT INTO question_queue (position, question_id) VALUES (?, ?)',
+                       enumerate(order))
+    cursor.execute('''
+        UPDATE session_metadata
+        SET queue_watermark = (SELECT COALESCE(MAX(id), 0) FROM responses)
+        WHERE id = 1
+    ''')
+
+
+def _append_to_question_queue(cursor, category_spacing, first_order_index):
+    """Queue questions imported from first_order_index on after everything already queued"""
+    questions = cursor.execute('''
+        SELECT id, category, order_index, priority_score, alignment_score
+        FROM questions
+        WHERE order_index >= ?
+    ''', (first_order_index,)).fetchall()
+    order = schedule_questions([dict(q) for q in questions], category_spacing)
+
+    start = cursor.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM question_queue').fetchone()[0]
+    cursor.executemany('INSERT INTO question_queue (position, question_id) VALUES (?, ?)',
+                       ((start + offset, q['id']) for offset, q in enumerate(order)))
+
+
+def _migrate_base_schema(cursor):
+    """Create the original tables (no-op on databases that predate migrations)"""
+    # Questions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_text TEXT NOT NULL,
+            category TEXT,
+            order_index INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Responses table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id INTEGER NOT NULL,
+            audio_path TEXT,
+            transcription TEXT,
+            duration_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (question_id) REFERENCES questions (id)
+        )
+    ''')
+
+    # Metadata table for tracking progress
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            current_question_index INTEGER DEFAULT 0,
+            total_responses INTEGER DEFAULT 0,
+            last_session_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Initialize metadata if not exists
+    cursor.execute('SELECT COUNT(*) as count FROM session_metadata')
+    if cursor.fetchone()['count'] == 0:
+        cursor.execute('INSERT INTO session_metadata (current_question_index) VALUES (0)')
+
+
+def _migrate_lookup_indexes(cursor):
+    """Index the question-by-position and response listing access paths"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_questions_order_index
+        ON questions (order_index, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_question_created
+        ON responses (question_id, created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_created
+        ON responses (created_at)
+    ''')
+
+
+def _migrate_cached_counters(cursor):
+    """Keep question/response totals on session_metadata instead of COUNT(*)"""
+    cursor.execute('''
+        ALTER TABLE session_metadata
+        ADD COLUMN total_questions INTEGER DEFAULT 0
+    ''')
+    cursor.execute('''
+        UPDATE session_metadata
+        SET total_questions = (SELECT COUNT(*) FROM questions),
+            total_responses = (SELECT COUNT(*) FROM responses)
+    ''')
+
+
+def _migrate_question_text_hash(cursor):
+    """Store a normalized-text hash per question so imports can dedupe"""
+    cursor.execute('ALTER TABLE questions ADD COLUMN text_hash TEXT')
+    rows = cursor.execute('SELECT id, question_text FROM questions').fetchall()
+    cursor.executemany(
+        'UPDATE questions SET text_hash = ? WHERE id = ?',
+        [(question_text_hash(row['question_text']), row['id']) for row in rows],
+    )
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_questions_text_hash
+        ON questions (text_hash)
+    ''')
+
+
+def _migrate_transcription_jobs(cursor):
+    """Queue table for uploads awaiting background transcription"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transcription_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id INTEGER NOT NULL,
+            audio_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            transcription TEXT,
+            response_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (question_id) REFERENCES questions (id),
+            FOREIGN KEY (response_id) REFERENCES responses (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transcription_jobs_status
+        ON transcription_jobs (status, id)
+    ''')
+
+
+def _migrate_audio_path_indexes(cursor):
+    """Index audio paths so the compactor can repoint files without scans"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_audio_path
+        ON responses (audio_path)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transcription_jobs_audio_path
+        ON transcription_jobs (audio_path)
+    ''')
+
+
+def _migrate_full_text_search(cursor):
+    """FTS5 indexes over transcriptions and question text, kept in sync by triggers"""
+    # External-content tables: the text lives only in the base tables.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+            transcription,
+            content='responses',
+            content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+            question_text,
+            content='questions',
+            content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    for table, column, fts in (('responses', 'transcription', 'responses_fts'),
+                               ('questions', 'question_text', 'questions_fts')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END
+        ''')
+        # Only text edits touch the index; e.g. repointing audio_path does not.
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+            END
+        ''')
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _migrate_question_queue(cursor):
+    """Persist processor scores and precompute the queue of upcoming questions"""
+    cursor.execute('ALTER TABLE questions ADD COLUMN priority_score REAL')
+    cursor.execute('ALTER TABLE questions ADD COLUMN alignment_score REAL')
+    cursor.execute('ALTER TABLE session_metadata ADD COLUMN queue_watermark INTEGER DEFAULT 0')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_queue (
+            position INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL UNIQUE,
+            FOREIGN KEY (question_id) REFERENCES questions (id)
+        )
+    ''')
+    # Carry on where the old index-based session was: unanswered questions
+    # from the current index on, in import order. Kept self-contained so later
+    # scheduler changes do not alter what this migration produces.
+    current = cursor.execute('SELECT current_question_index FROM session_metadata WHERE id = 1').fetchone()
+    rows = cursor.execute('''
+        SELECT id FROM questions q
+        WHERE order_index >= ?
+          AND NOT EXISTS (SELECT 1 FROM responses r WHERE r.question_id = q.id)
+        ORDER BY order_index, id
+    ''', (current['current_question_index'] if current else 0,)).fetchall()
+    cursor.executemany('INSERT INTO question_queue (position, question_id) VALUES (?, ?)',
+                       ((position, row['id']) for position, row in enumerate(rows)))
+    cursor.execute('''
+        UPDATE session_metadata
+        SET queue_watermark = (SELECT COALESCE(MAX(id), 0) FROM responses)
+        WHERE id = 1
+    ''')
 
-        cursor.execute('UPDATE session_metadata SET current_question_index = 0 WHERE id = 1')
 
-        conn.commit()
-        conn.close()
+# Ordered schema migrations. PRAGMA user_version records how many have been
+# applied, so only append new entries; never edit or reorder existing ones.
+MIGRATIONS = (
+    _migrate_base_schema,
+    _migrate_lookup_indexes,
+    _migrate_cached_counters,
+    _migrate_question_text_hash,
+    _migrate_transcription_jobs,
+    _migrate_audio_path_indexes,
+    _migrate_full_text_search,
+    _migrate_question_queue,
+)
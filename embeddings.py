@@ -0,0 +1,267 @@
+"""
+Sentence embeddings shared by the app and the question processing scripts.
+
+The SentenceTransformer model is loaded on first use, so importing this module
+(or constructing an Embedder) costs nothing until text actually needs
+encoding. Vectors come back L2-normalized as float32, so cosine similarity is a
+plain dot product.
+
+``EmbeddingCache`` persists vectors in SQLite keyed on (text hash, model), and
+``CachedEmbedder`` consults it first, so repeated runs only encode new or
+changed text and never load the model when everything is cached.
+
+``ParallelEmbedder`` spreads encoding over a pool of processes, each with its
+own model instance, for many-core hosts without a GPU.
+"""
+
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Optional: sentence-transformers for local embeddings. Only looked up here;
+# importing it loads torch, so that waits until a model is actually needed.
+try:
+    import numpy as np
+    HAS_EMBEDDINGS = importlib.util.find_spec('sentence_transformers') is not None
+except ImportError:
+    HAS_EMBEDDINGS = False
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_CACHE_PATH = 'embedding_cache.db'
+
+# Keys per SELECT ... IN (...) when reading the cache
+CACHE_LOOKUP_BATCH = 500
+
+
+def text_hash(text):
+    """Cache key for a text: SHA-256 of its exact UTF-8 bytes"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Embedder:
+    """Lazily loaded SentenceTransformer producing unit-length vectors
+
+    Args:
+        model_name: SentenceTransformer model to load
+        batch_size: Texts encoded per forward pass
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=64):
+        if not HAS_EMBEDDINGS:
+            raise RuntimeError('sentence-transformers is not installed '
+                               '(pip install sentence-transformers)')
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        """Encode a list of texts into an (n, dimension) float32 array"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        model = self.model
+        # One forward pass at a time; torch already uses every core for it.
+        with self._lock:
+            vectors = model.encode(
+                list(texts),
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        return vectors.astype(np.float32, copy=False)
+
+
+# Per-process model used by ParallelEmbedder workers
+_worker_embedder = None
+
+
+def _init_worker(model_name, batch_size, threads):
+    global _worker_embedder
+    try:
+        import torch
+        # Split the cores between workers instead of every worker using all of them.
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_embedder = Embedder(model_name, batch_size)
+    # Load now so the first shard's timing does not include it.
+    _worker_embedder.model
+
+
+def _encode_in_worker(texts):
+    started = time.perf_counter()
+    vectors = _worker_embedder.encode(texts)
+    return os.getpid(), vectors, time.perf_counter() - started
+
+
+class ParallelEmbedder:
+    """Encodes texts across a pool of worker processes, each with its own model
+
+    Each ``encode`` call splits its texts into one contiguous shard per
+    worker and reassembles the results in input order, so output is identical
+    to a single-process run. Workers start (and load the model) on first use.
+
+    Args:
+        model_name: SentenceTransformer model to load in every worker
+        workers: Number of worker processes
+        batch_size: Texts per forward pass inside a worker
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, workers=2, batch_size=64):
+        if not HAS_EMBEDDINGS:
+            raise RuntimeError('sentence-transformers is not installed '
+                               '(pip install sentence-transformers)')
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.worker_stats = {}      # pid -> {'texts': n, 'seconds': s}
+        self._pool = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn, not fork: forking a process that has imported torch is unsafe.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.batch_size, threads),
+            )
+        return self._pool
+
+    def encode(self, texts):
+        """Encode a list of texts into an (n, dimension) float32 array"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        shard_size = -(-len(texts) // self.workers)
+        shards = [texts[start:start + shard_size] for start in range(0, len(texts), shard_size)]
+
+        parts = []
+        # map() yields in submission order, whichever worker finishes first.
+        for pid, vectors, seconds in self._ensure_pool().map(_encode_in_worker, shards):
+            stats = self.worker_stats.setdefault(pid, {'texts': 0, 'seconds': 0.0})
+            stats['texts'] += len(vectors)
+            stats['seconds'] += seconds
+            parts.append(vectors)
+        return np.concatenate(parts)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class EmbeddingCache:
+    """SQLite table of embedding vectors keyed on (text hash, model name)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                text_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (text_hash, model)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, model, hashes):
+        """Return {text_hash: float32 vector} for the hashes that are cached"""
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), CACHE_LOOKUP_BATCH):
+                chunk = hashes[start:start + CACHE_LOOKUP_BATCH]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = self.conn.execute(f'''
+                    SELECT text_hash, dim, vector FROM embeddings
+                    WHERE model = ? AND text_hash IN ({placeholders})
+                ''', [model] + chunk)
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+        return found
+
+    def put_many(self, model, items):
+        """Store (text_hash, vector) pairs"""
+        rows = [(key, model, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+                for key, vector in items]
+        with self._lock:
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO embeddings (text_hash, model, dim, vector)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedEmbedder:
+    """Embedder front end that only encodes texts missing from an EmbeddingCache
+
+    Args:
+        embedder: Embedder used for cache misses; its model is loaded only
+            when there is a miss
+        cache: EmbeddingCache
+    """
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_name(self):
+        return self.embedder.model_name
+
+    def encode(self, texts):
+        """Encode a list of texts into an (n, dimension) float32 array"""
+        texts = list(texts)
+        keys = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in cached:
+                self.hits += 1
+            else:
+                missing.setdefault(key, text)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.embedder.encode(list(missing.values()))
+            fresh = dict(zip(missing, vectors))
+            self.cache.put_many(self.model_name, fresh.items())
+            cached.update(fresh)
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
@@ -1,47 +1,279 @@
 #!/usr/bin/env python3
 """
 Helper script to export all captured knowledge to JSON format
+
+Responses are streamed from the database and written one at a time, so memory
+use stays flat no matter how large the corpus grows. Output can be plain JSON
+or NDJSON, optionally gzip/zstd compressed, and referenced audio files can be
+bundled into a tar archive alongside the export.
 """
 
+import argparse
+import gzip
+import io
 import json
+import os
 import sys
+import tarfile
+import textwrap
 from datetime import datetime
 from database import KnowledgeDB
 
-def export_responses(output_file=None):
-    """Export all responses to JSON"""
+# Optional: zstd compression
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+FORMATS = ('json', 'ndjson')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+MANIFEST_NAME = 'manifest.json'
+
+
+def open_output(path, compression='none'):
+    """Open a text stream that compresses on the fly"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        if not HAS_ZSTD:
+            raise RuntimeError('zstd compression requires: pip install zstandard')
+        raw = open(path, 'wb')
+        writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def write_json(f, header, responses):
+    """Write the export document, emitting each response as it is read"""
+    f.write('{\n')
+    for key, value in header.items():
+        f.write(f'  {json.dumps(key)}: ')
+        f.write(json.dumps(value, indent=2).replace('\n', '\n  '))
+        f.write(',\n')
+    f.write('  "responses": [')
+
+    count = 0
+    for response in responses:
+        f.write(',\n' if count else '\n')
+        f.write(textwrap.indent(json.dumps(response, indent=2), '    '))
+        count += 1
+
+    f.write('\n  ]\n}\n' if count else ']\n}\n')
+    return count
+
+
+def write_ndjson(f, responses):
+    """Write one response per line"""
+    count = 0
+    for response in responses:
+        f.write(json.dumps(response))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def bundle_audio(responses, archive):
+    """Pass responses through, adding each referenced audio file to the archive once"""
+    added = set()
+    for response in responses:
+        audio_path = response.get('audio_path')
+        if audio_path and os.path.exists(audio_path):
+            arcname = os.path.join('audio', os.path.basename(audio_path))
+            # Responses can share a stored file; archive it only the first time.
+            if arcname not in added:
+                # tarfile copies the file in blocks; it is never read into memory whole.
+                archive.add(audio_path, arcname=arcname)
+                added.add(arcname)
+        yield response
+
+
+def default_output_file(fmt, compression):
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    extension = 'ndjson' if fmt == 'ndjson' else 'json'
+    return f'knowledge_export_{timestamp}.{extension}{COMPRESSION_SUFFIXES[compression]}'
+
+
+def write_export(output_file, responses, header, fmt='json', compression='none',
+                 audio_archive=None, archive_export=True):
+    """Stream responses to output_file (and audio to audio_archive); return the count"""
+    archive = None
+    if audio_archive:
+        mode = 'w:gz' if audio_archive.endswith(('.tar.gz', '.tgz')) else 'w'
+        archive = tarfile.open(audio_archive, mode)
+
+    try:
+        if archive is not None:
+            responses = bundle_audio(responses, archive)
+
+        with open_output(output_file, compression) as f:
+            if fmt == 'ndjson':
+                count = write_ndjson(f, responses)
+            else:
+                count = write_json(f, header, responses)
+
+        if archive is not None and archive_export:
+            archive.add(output_file, arcname=os.path.basename(output_file))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    return count
+
+
+def print_statistics(stats):
+    print(f"\nStatistics:")
+    print(f"  Total Questions: {stats['total_questions']}")
+    print(f"  Total Responses: {stats['total_responses']}")
+    print(f"  Completion: {stats['completion_percentage']:.1f}%")
+
+
+def export_responses(output_file=None, fmt='json', compression='none', audio_archive=None):
+    """Export all responses, streaming them from the database"""
     try:
         db = KnowledgeDB()
-        responses = db.get_all_responses()
         stats = db.get_stats()
 
-        # Create export data structure
-        export_data = {
+        # Determine output filename
+        if not output_file:
+            output_file = default_output_file(fmt, compression)
+
+        header = {
             'exported_at': datetime.now().isoformat(),
             'statistics': stats,
-            'responses': responses
         }
+        count = write_export(output_file, db.iter_responses(), header, fmt, compression, audio_archive)
 
-        # Determine output filename
-        if not output_file:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = f'knowledge_export_{timestamp}.json'
+        print(f"✓ Successfully exported {count} responses!")
+        print(f"✓ File saved to: {output_file}")
+        if audio_archive:
+            print(f"✓ Audio bundled into: {audio_archive}")
+        print_statistics(stats)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
 
-        # Write to file
-        with open(output_file, 'w') as f:
-            json.dump(export_data, f, indent=2)
 
-        print(f"✓ Successfully exported {len(responses)} responses!")
-        print(f"✓ File saved to: {output_file}")
-        print(f"\nStatistics:")
-        print(f"  Total Questions: {stats['total_questions']}")
-        print(f"  Total Responses: {stats['total_responses']}")
-        print(f"  Completion: {stats['completion_percentage']:.1f}%")
+def load_manifest(manifest_path):
+    """Load the incremental export manifest, or start a new one"""
+    if not os.path.exists(manifest_path):
+        return {'watermark': {'last_response_id': 0, 'last_created_at': None}, 'deltas': []}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_path):
+    """Atomically replace the manifest so a crash never leaves it half-written"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def track_watermark(responses, watermark):
+    """Pass responses through, recording the first and last one seen"""
+    for response in responses:
+        watermark.setdefault('first', response)
+        watermark['last'] = response
+        yield response
+
+
+def export_incremental(output_dir='exports', fmt='ndjson', compression='none', bundle=False):
+    """Export only responses newer than the last incremental export
+
+    Each run writes one delta file into output_dir and appends it to
+    MANIFEST_NAME. Deltas are listed oldest first and hold responses in id
+    order, so concatenating them in manifest order replays the full history.
+    """
+    try:
+        db = KnowledgeDB()
+        stats = db.get_stats()
+        os.makedirs(output_dir, exist_ok=True)
+
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        manifest = load_manifest(manifest_path)
+        since_id = manifest['watermark']['last_response_id']
+
+        # Write under a temporary name; the delta is named after the id range
+        # it covers once that is known, so names are unique and sort in order.
+        extension = ('.ndjson' if fmt == 'ndjson' else '.json') + COMPRESSION_SUFFIXES[compression]
+        partial_file = os.path.join(output_dir, 'delta.partial' + extension)
+        partial_archive = os.path.join(output_dir, 'delta.partial.tar') if bundle else None
+
+        header = {
+            'exported_at': datetime.now().isoformat(),
+            'since_response_id': since_id,
+            'statistics': stats,
+        }
+        seen = {}
+        responses = track_watermark(db.iter_responses_since(since_id), seen)
+        # The manifest pairs each delta with its audio archive, so the archive
+        # only carries audio.
+        count = write_export(partial_file, responses, header, fmt, compression,
+                             partial_archive, archive_export=False)
+
+        if count == 0:
+            os.remove(partial_file)
+            if partial_archive:
+                os.remove(partial_archive)
+            print(f"✓ No new responses since response {since_id}; nothing exported.")
+            return
+
+        first, last = seen['first'], seen['last']
+        delta_name = f"knowledge_delta_{first['id']:010d}_{last['id']:010d}"
+        output_file = os.path.join(output_dir, delta_name + extension)
+        os.replace(partial_file, output_file)
+        audio_archive = None
+        if partial_archive:
+            audio_archive = os.path.join(output_dir, delta_name + '_audio.tar')
+            os.replace(partial_archive, audio_archive)
+
+        manifest['deltas'].append({
+            'file': os.path.basename(output_file),
+            'audio_archive': os.path.basename(audio_archive) if audio_archive else None,
+            'format': fmt,
+            'compression': compression,
+            'exported_at': header['exported_at'],
+            'count': count,
+            'first_response_id': first['id'],
+            'last_response_id': last['id'],
+            'first_created_at': first['created_at'],
+            'last_created_at': last['created_at'],
+        })
+        manifest['watermark'] = {
+            'last_response_id': last['id'],
+            'last_created_at': last['created_at'],
+        }
+        save_manifest(manifest, manifest_path)
+
+        print(f"✓ Exported {count} new responses (ids {first['id']}-{last['id']})")
+        print(f"✓ Delta saved to: {output_file}")
+        print(f"✓ Manifest updated: {manifest_path}")
+        print_statistics(stats)
 
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
 
+
 if __name__ == '__main__':
-    output_file = sys.argv[1] if len(sys.argv) > 1 else None
-    export_responses(output_file)
+    parser = argparse.ArgumentParser(description='Export captured knowledge')
+    parser.add_argument('output_file', nargs='?', help='Output path (default: timestamped file)')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='Output format (default: json, or ndjson with --incremental)')
+    parser.add_argument('--compress', choices=COMPRESSIONS, default='none', help='Compress the output')
+    parser.add_argument('--bundle-audio', metavar='ARCHIVE',
+                        help='Also write referenced audio files to this tar archive (.tar or .tar.gz); '
+                             'with --incremental each delta gets its own archive and the name is ignored')
+    parser.add_argument('--incremental', metavar='DIR', nargs='?', const='exports',
+                        help='Write only responses added since the last incremental export '
+                             'into DIR (default: exports/), tracked by DIR/manifest.json')
+    args = parser.parse_args()
+
+    if args.incremental:
+        export_incremental(args.incremental, args.format or 'ndjson', args.compress,
+                           bundle=bool(args.bundle_audio))
+    else:
+        export_responses(args.output_file, args.format or 'json', args.compress, args.bundle_audio)
@@ -1,22 +1,194 @@
 #!/usr/bin/env python3
 """
 Helper script to import questions from a JSON file into the database
+
+Accepts either a JSON array or newline-delimited JSON (one question string or
+object per line). The file is parsed incrementally and written in batches, so
+large question banks never have to fit in memory.
+
+With --merge-near-duplicates, paraphrased repeats of earlier questions in the
+file or of questions already in the database are dropped (see
+near_duplicates); this reads the whole file and question bank into memory.
 """
 
+import argparse
 import json
+import re
 import sys
 from database import KnowledgeDB
 
-def import_from_file(file_path):
-    """Import questions from a JSON file"""
+# Optional: numpy for near-duplicate detection
+try:
+    from near_duplicates import DEFAULT_THRESHOLD, NearDuplicateDetector, merge_near_duplicates, question_text
+    HAS_NEAR_DUPLICATES = True
+except ImportError:
+    HAS_NEAR_DUPLICATES = False
+    DEFAULT_THRESHOLD = 0.6
+
+READ_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buf, pos, eof
+        # Drop consumed text now and then rather than re-slicing per element
+        if pos >= chunk_size:
+            buf = buf[pos:]
+            pos = 0
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf += chunk
+
+    def next_char():
+        """Skip whitespace and return the next character ('' at end of input)"""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            read_more()
+
+    if next_char() != '[':
+        raise json.JSONDecodeError('Expected a JSON array', buf, pos)
+    pos += 1
+
+    if next_char() == ']':
+        pos += 1
+    else:
+        while True:
+            if not next_char():
+                raise json.JSONDecodeError('Unterminated JSON array', buf, pos)
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    # The value straddles the end of the buffer; pull in more text.
+                    read_more()
+                    continue
+                # Only a ',' or ']' proves the value is complete: a number cut
+                # off at the end of the buffer ('-4.' of '-4.5e3') still decodes.
+                after = _WHITESPACE.match(buf, end).end()
+                if eof or (after < len(buf) and buf[after] in ',]'):
+                    break
+                read_more()
+            pos = end
+            yield item
+
+            delimiter = next_char()
+            pos += 1
+            if delimiter == ']':
+                break
+            if delimiter != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos - 1)
+            if next_char() == ']':
+                raise json.JSONDecodeError('Trailing comma in JSON array', buf, pos)
+
+    if next_char():
+        raise json.JSONDecodeError('Extra data after JSON array', buf, pos)
+
+
+def iter_ndjson(f):
+    """Yield one JSON value per non-blank line"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f'line {line_number}: {e.msg}', e.doc, e.pos)
+
+
+def iter_question_records(f):
+    """Detect JSON array vs NDJSON from the first character and stream records"""
+    first = ''
+    while not first:
+        ch = f.read(1)
+        if not ch:
+            return
+        if not ch.isspace():
+            first = ch
+
+    if first == '[':
+        yield from iter_json_array(_Prepend('[', f))
+    else:
+        yield from iter_ndjson(_Prepend(first, f))
+
+
+class _Prepend:
+    """File wrapper that replays already-consumed leading text"""
+
+    def __init__(self, prefix, f):
+        self.prefix = prefix
+        self.f = f
+
+    def read(self, size=-1):
+        prefix, self.prefix = self.prefix, ''
+        if size is not None and size >= 0:
+            return prefix + self.f.read(max(size - len(prefix), 0))
+        return prefix + self.f.read()
+
+    def __iter__(self):
+        if self.prefix:
+            prefix, self.prefix = self.prefix, ''
+            yield prefix + self.f.readline()
+        yield from self.f
+
+
+def merge_with_bank(db, records, threshold=DEFAULT_THRESHOLD):
+    """Records that do not nearly duplicate an earlier record or a stored question"""
+    existing = [q['question_text'] for q in db.iter_questions()]
+    kept, merged = merge_near_duplicates(records, existing, NearDuplicateDetector(threshold))
+    if merged:
+        print(f"Merged {len(merged)} near-duplicate questions:")
+        for record, original in merged[:10]:
+            print(f"  ~ {question_text(record)[:80]}")
+            print(f"    = {original[:80]}")
+        if len(merged) > 10:
+            print(f"  ... and {len(merged) - 10} more")
+    return kept
+
+
+def import_from_file(file_path, merge_near_duplicates=False, threshold=DEFAULT_THRESHOLD):
+    """Import questions from a JSON or NDJSON file
+
+    Args:
+        file_path: JSON array or NDJSON file of questions
+        merge_near_duplicates: Drop near-duplicates of earlier or stored questions
+        threshold: Similarity at which questions count as near duplicates
+    """
     try:
-        with open(file_path, 'r') as f:
-            questions = json.load(f)
+        if merge_near_duplicates and not HAS_NEAR_DUPLICATES:
+            print("Error: --merge-near-duplicates requires numpy (pip install numpy)")
+            sys.exit(1)
 
         db = KnowledgeDB()
-        db.import_questions(questions)
+        read = 0
 
-        print(f"✓ Successfully imported {len(questions)} questions!")
+        def counted(records):
+            nonlocal read
+            for record in records:
+                read += 1
+                yield record
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records = counted(iter_question_records(f))
+            if merge_near_duplicates:
+                records = merge_with_bank(db, records, threshold)
+            imported = db.import_questions(records)
+
+        print(f"✓ Successfully imported {imported} questions!")
+        if read > imported:
+            print(f"  Skipped {read - imported} empty or duplicate entries")
         print(f"\nYou can now run the app with: python app.py")
 
     except FileNotFoundError:
@@ -30,11 +202,15 @@ def import_from_file(file_path):
         sys.exit(1)
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python import_questions.py <json_file>")
-        print("\nExample: python import_questions.py sample_questions.json")
-        print("         python import_questions.py my_1000_questions.json")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description='Import questions into the database',
+        epilog='Example: python import_questions.py sample_questions.json')
+    parser.add_argument('json_file',
+                        help='JSON array or newline-delimited JSON (one question per line)')
+    parser.add_argument('--merge-near-duplicates', action='store_true',
+                        help='Skip paraphrased repeats of earlier or already imported questions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Near-duplicate similarity threshold, 0-1 (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
 
-    file_path = sys.argv[1]
-    import_from_file(file_path)
+    import_from_file(args.json_file, args.merge_near_duplicates, args.threshold)
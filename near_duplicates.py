@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate question detection
+
+Finds paraphrased repeats (different wording, punctuation or spelling of the
+same question) in a question bank without comparing every pair:
+
+1. Each question is normalized and cut into overlapping 4-byte shingles.
+2. A MinHash signature (the minimum of each of num_perm hash functions over
+   the shingles) is computed with numpy for all questions at once; the
+   fraction of equal signature values estimates the Jaccard similarity of two
+   questions' shingle sets.
+3. LSH banding buckets questions whose signatures agree on a whole band, so
+   only questions sharing a bucket become candidate pairs.
+4. Candidates whose estimated similarity reaches the threshold (and,
+   optionally, whose embeddings are similar enough) are joined with
+   union-find into clusters.
+
+Usage:
+    python near_duplicates.py my_1000_questions.json
+    python near_duplicates.py --db knowledge.db --threshold 0.7 --output clusters.json
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_NUM_PERM = 128
+DEFAULT_EMBEDDING_THRESHOLD = 0.85
+SHINGLE_BYTES = 4
+
+# Questions whose shingles are hashed together; bounds the temporary arrays
+SIGNATURE_CHUNK = 20000
+# Candidate pairs compared at a time
+VERIFY_CHUNK = 100000
+# Buckets up to this size yield every pair of their members; larger ones
+# (usually many copies of one short text) only pair neighbours and the first
+# member, keeping the candidate count linear
+MAX_BUCKET_SIZE = 100
+
+
+def question_text(record):
+    """Question text of an import record (a string or a dict with 'question' or 'text')"""
+    text = record if isinstance(record, str) else record.get('question', record.get('text', ''))
+    return str(text).strip()
+
+
+def _shingle_text(text):
+    # Case, punctuation and spacing differences are not meaningful
+    return ' '.join(re.sub(r'[\W_]+', ' ', text.lower()).split())
+
+
+def _choose_bands(num_perm, threshold):
+    """(bands, rows) for the LSH split, erring towards more candidates
+
+    Two questions with similarity s share at least one bucket with
+    probability 1 - (1 - s**rows)**bands, which rises steeply around
+    (1 / bands) ** (1 / rows); pick the split whose turning point is closest
+    below the threshold, since candidates are verified afterwards.
+    """
+    splits = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    below = [split for split in splits if (1 / split[0]) ** (1 / split[1]) <= threshold]
+    return max(below or splits, key=lambda split: (1 / split[0]) ** (1 / split[1]))
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = np.arange(size)
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # The smaller index stays the root, so it represents the cluster
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+class NearDuplicateDetector:
+    """Clusters near-duplicate texts with MinHash and LSH
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity of two questions'
+            shingle sets for them to count as duplicates
+        num_perm: MinHash hash functions; more gives better estimates
+        seed: Seed for the hash functions, so results are repeatable
+        embedder: Optional embeddings.Embedder; when given, candidate pairs
+            must also have a cosine similarity of at least
+            embedding_threshold
+        embedding_threshold: Minimum cosine similarity with an embedder
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, seed=1,
+                 embedder=None, embedding_threshold=DEFAULT_EMBEDDING_THRESHOLD):
+        if not 0 < threshold <= 1:
+            raise ValueError('threshold must be in (0, 1]')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        self.embedder = embedder
+        self.embedding_threshold = embedding_threshold
+
+        # Multiply-shift hashes of the 32-bit shingles: ((a * x + b) mod 2**64) >> 32
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """(len(texts), num_perm) uint32 MinHash signatures"""
+        texts = list(texts)
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), SIGNATURE_CHUNK):
+            chunk = texts[start:start + SIGNATURE_CHUNK]
+            signatures[start:start + len(chunk)] = self._chunk_signatures(chunk)
+        return signatures
+
+    def _chunk_signatures(self, texts):
+        encoded = [_shingle_text(text).encode('utf-8').ljust(SHINGLE_BYTES) for text in texts]
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+        # Every 4-byte window as one 32-bit shingle, then drop windows that run into the next text
+        windows = data[:len(data) - SHINGLE_BYTES + 1] << np.uint64(24)
+        for offset in range(1, SHINGLE_BYTES):
+            windows |= data[offset:len(data) - SHINGLE_BYTES + 1 + offset] << np.uint64(8 * (SHINGLE_BYTES - offset))
+        ends = np.cumsum(lengths)
+        valid = np.ones(len(data), dtype=bool)
+        for back in range(1, SHINGLE_BYTES):
+            valid[ends - back] = False
+        shingles = windows[valid[:len(windows)]]
+        offsets = np.concatenate(([0], np.cumsum(lengths - SHINGLE_BYTES + 1)[:-1]))
+
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for perm in range(self.num_perm):
+            hashed = (shingles * self._a[perm] + self._b[perm]) >> np.uint64(32)
+            signatures[:, perm] = np.minimum.reduceat(hashed, offsets)
+        return signatures
+
+    def candidate_pairs(self, signatures):
+        """(n, 2) array of index pairs that share an LSH bucket, smaller index first
+
+        Every pair within a bucket is a candidate, unless the bucket holds
+        more than MAX_BUCKET_SIZE questions. Members of such a bucket are only
+        paired with the member before them and with the bucket's first
+        member, so a near duplicate of a later member can be missed unless
+        another band brings the two together (in practice large buckets are
+        copies of the same text, which still end up in one cluster).
+        """
+        pairs = []
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[:, band * self.rows:(band + 1) * self.rows])
+            keys = block.view(np.dtype((np.void, block.dtype.itemsize * self.rows))).ravel()
+            _, buckets = np.unique(keys, return_inverse=True)
+            order = np.argsort(buckets, kind='stable')
+            sorted_buckets = buckets[order]
+            shared = sorted_buckets[1:] == sorted_buckets[:-1]
+            if not shared.any():
+                continue
+
+            # Bucket of each sorted position, its size and the position's rank within it
+            starts = np.flatnonzero(np.concatenate(([True], ~shared)))
+            sizes = np.diff(np.append(starts, len(order)))
+            bucket = np.repeat(np.arange(len(starts)), sizes)
+            size = sizes[bucket]
+            rank = np.arange(len(order)) - starts[bucket]
+
+            # All pairs: each position with the one `step` places after it in its bucket
+            live = np.flatnonzero((size > 1) & (size <= MAX_BUCKET_SIZE))
+            step = 1
+            while len(live):
+                live = live[rank[live] + step < size[live]]
+                pairs.append(np.stack([order[live], order[live + step]], axis=1))
+                step += 1
+
+            # Oversized buckets: the previous member and the first member
+            later = np.flatnonzero((size > MAX_BUCKET_SIZE) & (rank > 0))
+            pairs.append(np.stack([order[later - 1], order[later]], axis=1))
+            pairs.append(np.stack([order[starts[bucket[later]]], order[later]], axis=1))
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.sort(np.concatenate(pairs), axis=1).astype(np.int64)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        # Deduplicate as one sorted integer per pair; much faster than unique rows
+        n = len(signatures)
+        keys = pairs[:, 0] * n + pairs[:, 1]
+        keys.sort()
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        return np.stack([keys // n, keys % n], axis=1)
+
+    def similar_pairs(self, texts, signatures=None):
+        """Candidate pairs confirmed as near duplicates, with their estimated similarity"""
+        texts = list(texts)
+        if signatures is None:
+            signatures = self.signatures(texts)
+        pairs = self.candidate_pairs(signatures)
+
+        kept, similarity = [], []
+        for start in range(0, len(pairs), VERIFY_CHUNK):
+            chunk = pairs[start:start + VERIFY_CHUNK]
+            estimate = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+            match = estimate >= self.threshold
+            kept.append(chunk[match])
+            similarity.append(estimate[match])
+        pairs = np.concatenate(kept) if kept else pairs
+        similarity = np.concatenate(similarity) if similarity else np.empty(0)
+
+        if self.embedder is not None and len(pairs):
+            involved = np.unique(pairs)
+            vectors = self.embedder.encode([texts[i] for i in involved])
+            row = np.full(len(texts), -1)
+            row[involved] = np.arange(len(involved))
+            cosine = np.einsum('ij,ij->i', vectors[row[pairs[:, 0]]], vectors[row[pairs[:, 1]]])
+            match = cosine >= self.embedding_threshold
+            pairs, similarity = pairs[match], similarity[match]
+        return pairs, similarity
+
+    def find_clusters(self, texts):
+        """Groups of indexes of near-duplicate texts
+
+        Each cluster is sorted, so its first index is the earliest occurrence;
+        clusters are ordered by that first index. Texts without duplicates
+        are left out.
+        """
+        texts = list(texts)
+        pairs, _similarity = self.similar_pairs(texts)
+        union_find = _UnionFind(len(texts))
+        for a, b in pairs:
+            union_find.union(a, b)
+
+        members = np.unique(pairs)
+        roots = np.array([union_find.find(i) for i in members], dtype=np.int64)
+        clusters = {}
+        for root, member in zip(roots, members):
+            clusters.setdefault(int(root), []).append(int(member))
+        return [clusters[root] for root in sorted(clusters)]
+
+
+def merge_near_duplicates(records, existing_texts=(), detector=None):
+    """Drop records that nearly duplicate an earlier record or an existing question
+
+    Records are kept in order; within a cluster the earliest question wins,
+    and questions already in existing_texts always win. Returns (kept
+    records, [(dropped record, text it duplicates), ...]).
+    """
+    detector = detector or NearDuplicateDetector()
+    existing_texts = list(existing_texts)
+    records = list(records)
+    texts = existing_texts + [question_text(record) for record in records]
+
+    duplicate_of = {}
+    for cluster in detector.find_clusters(texts):
+        for member in cluster[1:]:
+            duplicate_of[member] = cluster[0]
+
+    kept, merged = [], []
+    for position, record in enumerate(records, len(existing_texts)):
+        if position in duplicate_of:
+            merged.append((record, texts[duplicate_of[position]]))
+        else:
+            kept.append(record)
+    return kept, merged
+
+
+def load_texts(file_path=None, db_path=None):
+    """Question texts from an import file (JSON or NDJSON) or a knowledge database"""
+    if db_path:
+        from database import KnowledgeDB
+        db = KnowledgeDB(db_path)
+        try:
+            return [q['question_text'] for q in db.iter_questions()]
+        finally:
+            db.close()
+
+    from import_questions import iter_question_records
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [text for text in map(question_text, iter_question_records(f)) if text]
+
+
+def report(texts, clusters, output_file=None, shown=10):
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"✓ Found {len(clusters)} clusters of near-duplicate questions "
+          f"({duplicates} of {len(texts)} questions repeat an earlier one)")
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump([{
+                'question': texts[cluster[0]],
+                'duplicates': [texts[i] for i in cluster[1:]],
+                'indexes': cluster,
+            } for cluster in clusters], f, indent=2)
+        print(f"✓ Clusters saved to: {output_file}")
+
+    for cluster in sorted(clusters, key=len, reverse=True)[:shown]:
+        print(f"\n[{len(cluster)}] {texts[cluster[0]][:100]}")
+        for i in cluster[1:]:
+            print(f"    ~ {texts[i][:100]}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find near-duplicate questions')
+    parser.add_argument('input_file', nargs='?', help='Question file (JSON array or NDJSON)')
+    parser.add_argument('--db', help='Check the questions in this database instead (e.g. knowledge.db)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Minimum estimated shingle similarity, 0-1 (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--embedding', action='store_true',
+                        help='Also require similar sentence embeddings (needs sentence-transformers)')
+    parser.add_argument('--embedding-threshold', type=float, default=DEFAULT_EMBEDDING_THRESHOLD,
+                        help=f'Minimum cosine similarity with --embedding (default: {DEFAULT_EMBEDDING_THRESHOLD})')
+    parser.add_argument('--output', help='Write the clusters to this JSON file')
+    args = parser.parse_args()
+
+    if (args.input_file is None) == (args.db is None):
+        parser.error('give either an input file or --db')
+
+    try:
+        embedder = None
+        if args.embedding:
+            from embeddings import Embedder
+            embedder = Embedder()
+        texts = load_texts(args.input_file, args.db)
+        detector = NearDuplicateDetector(args.threshold, embedder=embedder,
+                                         embedding_threshold=args.embedding_threshold)
+        report(texts, detector.find_clusters(texts), args.output)
+
+    except FileNotFoundError:
+        print(f"Error: File '{args.input_file}' not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Synthesize every question in the bank into the TTS cache ahead of time
+
+Run this after importing questions so the first playback of each prompt is
+served from disk instead of waiting on the TTS service.
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from database import KnowledgeDB
+from speech_setup import TTS_VOICE, build_tts_backend, build_tts_cache, cached_speech
+
+
+def prewarm(voice=TTS_VOICE, workers=4):
+    """Synthesize all question texts not already cached"""
+    db = tts_backend = None
+    try:
+        db = KnowledgeDB()
+        tts_cache = build_tts_cache()
+        # A one-off batch does not need background health probes.
+        tts_backend = build_tts_backend(health_checks=False)
+        done = 0
+        failed = 0
+
+        def warm(text):
+            return _warm(tts_backend, tts_cache, text, voice)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = (q['question_text'] for q in db.iter_questions())
+            for result in pool.map(warm, texts):
+                done += 1
+                failed += 0 if result else 1
+                if done % 100 == 0:
+                    print(f"  Processed {done} questions...")
+
+        stats = tts_cache.stats()
+        print(f"✓ Prewarmed {done - failed} of {done} questions (voice={voice})")
+        if failed:
+            print(f"  {failed} questions failed to synthesize")
+        print(f"✓ Cache: {stats['entries']} entries, "
+              f"{stats['total_bytes'] / 1024 / 1024:.1f} / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        if stats['entries'] < done - failed:
+            print("  Warning: cache is smaller than the question bank; raise SPEECH_TTS_CACHE_MAX_MB")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        if tts_backend is not None:
+            tts_backend.close()
+        if db is not None:
+            db.close()
+
+
+def _warm(tts_backend, tts_cache, text, voice):
+    try:
+        cached_speech(tts_backend, tts_cache, text, voice)
+        return True
+    except Exception as e:
+        print(f"  Failed: {text[:60]}... ({str(e)})")
+        return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prewarm the TTS audio cache')
+    parser.add_argument('--voice', default=TTS_VOICE, help='Voice to synthesize with')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent TTS requests')
+    args = parser.parse_args()
+
+    prewarm(args.voice, args.workers)
@@ -0,0 +1,246 @@
+"""
+Streaming input and output for the question processing scripts.
+
+Questions are read a chunk of rows at a time: .xlsx workbooks through
+openpyxl's read-only mode, CSV through pandas' chunked reader and Parquet (with
+pyarrow) by record batch. Scored records are spooled to a temporary file as
+each chunk is processed; only their sort keys and file offsets stay in memory,
+and the ranked output is written from the spool one record at a time. Peak
+memory therefore follows the chunk size, not the size of the input file.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Optional: openpyxl for streaming .xlsx workbooks
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+
+# Optional: pyarrow for Parquet input
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+DEFAULT_CHUNK_SIZE = 5000
+MIN_QUESTION_LENGTH = 10
+INPUT_FORMATS = {
+    '.xlsx': 'xlsx', '.xlsm': 'xlsx', '.xls': 'excel',
+    '.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet',
+}
+
+
+def find_question_column(columns):
+    """First column whose name mentions a question or prompt, or None"""
+    for col in columns:
+        name = str(col).lower()
+        if 'question' in name or 'prompt' in name:
+            return col
+    return None
+
+
+def clean_questions(values):
+    """Stripped question texts from a Series, dropping blanks and very short entries"""
+    texts = values[values.notna()].astype(str).str.strip()
+    return texts[(texts != 'nan') & (texts.str.len() >= MIN_QUESTION_LENGTH)]
+
+
+class QuestionReader:
+    """Iterates over the question column of a file in chunks
+
+    Each chunk is a pandas Series of raw cell values (see clean_questions)
+    indexed by the row's position in the file (0 for the first row under the
+    header). ``column`` is set once the header
+    has been read, ``column_guessed`` is true when no column name mentioned
+    questions and the first one was used, and ``rows`` counts the data rows
+    read so far.
+
+    Args:
+        path: .xlsx, .xls, .csv or .parquet file
+        chunk_size: Rows read per chunk
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported question file type '{extension}' "
+                             f"(expected one of {', '.join(sorted(INPUT_FORMATS))})")
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.format = INPUT_FORMATS[extension]
+        self.column = None
+        self.column_guessed = False
+        self.rows = 0
+
+    def _choose_column(self, columns):
+        if not len(columns):
+            raise ValueError(f'{self.path} has no columns')
+        self.column = find_question_column(columns)
+        if self.column is None:
+            self.column = columns[0]
+            self.column_guessed = True
+        return list(columns).index(self.column)
+
+    def __iter__(self):
+        chunks = {
+            'xlsx': self._xlsx_chunks,
+            'excel': self._excel_chunks,
+            'csv': self._csv_chunks,
+            'parquet': self._parquet_chunks,
+        }[self.format]()
+        for values in chunks:
+            self.rows += len(values)
+            yield values
+
+    def _xlsx_chunks(self):
+        if not HAS_OPENPYXL:
+            raise RuntimeError('Reading .xlsx files requires: pip install openpyxl')
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            # Same names pandas would give blank header cells
+            header = [f'Unnamed: {i}' if name is None else name for i, name in enumerate(header)]
+            position = self._choose_column(header)
+
+            values = []
+            for row in rows:
+                values.append(row[position] if position < len(row) else None)
+                if len(values) >= self.chunk_size:
+                    yield pd.Series(values, index=range(self.rows, self.rows + len(values)), dtype=object)
+                    values = []
+            if values:
+                yield pd.Series(values, index=range(self.rows, self.rows + len(values)), dtype=object)
+        finally:
+            workbook.close()
+
+    def _excel_chunks(self):
+        # Legacy .xls cannot be streamed; read it whole and hand it out in chunks.
+        df = pd.read_excel(self.path)
+        self._choose_column(df.columns)
+        values = df[self.column]
+        for start in range(0, len(values), self.chunk_size):
+            yield values.iloc[start:start + self.chunk_size]
+
+    def _csv_chunks(self):
+        self._choose_column(pd.read_csv(self.path, nrows=0).columns)
+        # As text, so numeric-looking questions are kept exactly as written.
+        for chunk in pd.read_csv(self.path, usecols=[self.column], dtype=str, chunksize=self.chunk_size):
+            yield chunk[self.column]
+
+    def _parquet_chunks(self):
+        if not HAS_PYARROW:
+            raise RuntimeError('Reading Parquet files requires: pip install pyarrow')
+        parquet = pq.ParquetFile(self.path)
+        self._choose_column(parquet.schema_arrow.names)
+        for batch in parquet.iter_batches(batch_size=self.chunk_size, columns=[self.column]):
+            values = batch.column(0).to_pandas()
+            values.index = range(self.rows, self.rows + len(values))
+            yield values
+
+
+# Shared, so each record does not construct a new encoder
+_INDENTED_ENCODER = json.JSONEncoder(indent=2)
+
+
+def encode_json(item):
+    """item encoded as by json.dumps(item, indent=2)"""
+    return _INDENTED_ENCODER.encode(item)
+
+
+class RankedSpool:
+    """Records spooled to a temporary file and read back highest score first
+
+    Records are stored already encoded as indented JSON, so ranking them
+    only adds the rank; ties keep the order in which records were added.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._offsets = []
+        self._scores = []
+        self._end = 0
+
+    def __len__(self):
+        return sum(len(scores) for scores in self._scores)
+
+    def add(self, records, scores):
+        """Spool a chunk of dict records with their scores"""
+        offsets = []
+        for record in records:
+            data = encode_json(record).encode('utf-8')
+            self._file.write(data)
+            offsets.append(self._end)
+            self._end += len(data)
+        scores = np.asarray(scores)
+        if len(offsets) != len(scores):
+            raise ValueError('records and scores differ in length')
+        self._offsets.append(np.asarray(offsets, dtype=np.int64))
+        self._scores.append(scores)
+
+    def ranked(self):
+        """Yield (rank, score, JSON text) for every record, highest score first
+
+        The text is the record as ``json.dumps(record, indent=2)`` would
+        write it, with ``priority_rank`` (1-based) added as its last key.
+        """
+        if not self._scores:
+            return
+        offsets = np.concatenate(self._offsets + [np.array([self._end], dtype=np.int64)])
+        scores = np.concatenate(self._scores)
+        order = np.argsort(-scores, kind='stable')
+        for rank, i in enumerate(order, 1):
+            self._file.seek(offsets[i])
+            text = self._file.read(offsets[i + 1] - offsets[i]).decode('utf-8')
+            # Replace the closing '\n}' with the rank and the closing brace
+            yield rank, scores[i], f'{text[:-2]},\n  "priority_rank": {rank}\n}}'
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonArrayWriter:
+    """Writes a JSON array one element at a time
+
+    The output is identical to ``json.dump(items, f, indent=2)``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w')
+
+    def write(self, item):
+        self.write_encoded(encode_json(item))
+
+    def write_encoded(self, text):
+        """Append an element already encoded with indent=2"""
+        self._file.write(',\n  ' if self.count else '[\n  ')
+        self._file.write(text.replace('\n', '\n  '))
+        self.count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write('\n]' if self.count else '[]')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
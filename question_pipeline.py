@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Question processing pipeline for the Generation Alpha mission
+
+Prioritizes a file of questions for import by passing it, a chunk at a time,
+through a chain of generator stages:
+
+    read -> clean -> dedupe -> score -> categorize -> rank -> write
+
+Scoring and categorization come from an interchangeable scorer (see
+question_scoring): mission keyword matching, or semantic similarity to the
+mission themes. Ranking spools scored questions to disk and sorts only their
+scores; with --top N it keeps the best N in a heap and never sorts the rest.
+
+Usage:
+    python question_pipeline.py questions.xlsx
+    python question_pipeline.py questions.csv ranked.json --scorer embedding --top 200
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from embeddings import DEFAULT_CACHE_PATH, DEFAULT_MODEL
+from question_io import (
+    DEFAULT_CHUNK_SIZE, JsonArrayWriter, QuestionReader, RankedSpool, clean_questions, encode_json,
+)
+from question_scoring import DEFAULT_BATCH_SIZE, SCORERS, EmbeddingScorer, KeywordScorer
+
+DEFAULT_OUTPUTS = {'keyword': 'questions_prioritized.json', 'embedding': 'questions_ai_prioritized.json'}
+TOP_QUESTIONS_SHOWN = 10
+
+
+class Batch:
+    """A chunk of questions moving through the pipeline
+
+    ``texts`` is a Series of question texts indexed by row number in the
+    input file. The score stage sets ``features`` (scorer specific) and score
+    ``fields``; the categorize stage adds the 'category' field.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.features = None
+        self.fields = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def records(self, positions=None):
+        """Output records for every question, or just those at the given positions"""
+        names = ['category'] + [name for name in self.fields if name != 'category']
+        columns = [self.texts.tolist()] + [
+            value.tolist() if isinstance(value, np.ndarray) else list(value)
+            for value in (self.fields[name] for name in names)
+        ] + [self.texts.index.tolist()]
+        keys = ['question'] + names + ['original_index']
+        rows = zip(*columns) if positions is None else (
+            [column[i] for column in columns] for i in positions)
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class PipelineStats:
+    """Counts gathered as questions flow through the stages"""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.invalid = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.categories = {}
+        self.tiers = {label: 0 for label, _minimum in scorer.tiers}
+        self.started = time.perf_counter()
+
+
+# Stages: each takes an iterable of chunks and yields chunks
+
+
+def clean(chunks, stats):
+    """Strip question texts and drop blank or too-short ones"""
+    for values in chunks:
+        texts = clean_questions(values)
+        stats.invalid += len(values) - len(texts)
+        if len(texts):
+            yield Batch(texts)
+
+
+def _dedupe_key(text):
+    # Case and spacing differences do not make a question new
+    return hashlib.blake2b(' '.join(text.casefold().split()).encode('utf-8'), digest_size=16).digest()
+
+
+def dedupe(batches, stats):
+    """Drop repeats of questions already seen, keeping the first occurrence"""
+    seen = set()
+    for batch in batches:
+        keep = np.ones(len(batch), dtype=bool)
+        for i, text in enumerate(batch.texts):
+            key = _dedupe_key(text)
+            if key in seen:
+                keep[i] = False
+            else:
+                seen.add(key)
+        stats.duplicates += int((~keep).sum())
+        if not keep.all():
+            batch.texts = batch.texts[keep]
+        if len(batch):
+            yield batch
+
+
+def score(batches, scorer):
+    """Attach the scorer's features and score fields"""
+    for batch in batches:
+        batch.features = scorer.analyze(batch.texts)
+        batch.fields.update(scorer.score(batch.features))
+        yield batch
+
+
+def categorize(batches, scorer):
+    """Attach each question's category"""
+    for batch in batches:
+        batch.fields['category'] = scorer.categorize(batch.features)
+        batch.features = None
+        yield batch
+
+
+def tally(batches, stats):
+    """Count categories and score tiers, reporting progress"""
+    tiers = stats.scorer.tiers
+    for batch in batches:
+        scores = np.asarray(batch.fields[stats.scorer.score_field])
+        assigned = np.zeros(len(scores), dtype=bool)
+        for label, minimum in tiers:
+            in_tier = (scores >= minimum) & ~assigned
+            stats.tiers[label] += int(in_tier.sum())
+            assigned |= in_tier
+        for category in batch.fields['category']:
+            stats.categories[category] = stats.categories.get(category, 0) + 1
+
+        stats.processed += len(batch)
+        elapsed = time.perf_counter() - stats.started
+        print(f"  Processed {stats.processed} questions "
+              f"({stats.processed / elapsed if elapsed else 0:.1f} questions/sec)")
+        yield batch
+
+
+def rank(batches, score_field, top=None):
+    """Yield (rank, score, JSON text) for the questions, highest score first
+
+    Ties keep their order in the input. Every question is spooled to disk and
+    only the scores are sorted; with top, a heap keeps the best ``top``
+    questions instead and everything else is discarded as it arrives.
+    """
+    if top is None:
+        with RankedSpool() as spool:
+            for batch in batches:
+                spool.add(batch.records(), batch.fields[score_field])
+            yield from spool.ranked()
+        return
+
+    # Min-heap of (score, -sequence, record): the root is the weakest kept question
+    heap = []
+    sequence = 0
+    for batch in batches:
+        scores = np.asarray(batch.fields[score_field])
+        positions = np.arange(len(batch))
+        if len(heap) >= top:
+            # Only questions scoring at least the weakest kept one can displace it
+            positions = positions[scores >= heap[0][0]]
+        for position, record in zip(positions, batch.records(positions)):
+            item = (record[score_field], -(sequence + position), record)
+            if len(heap) < top:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        sequence += len(batch)
+
+    heap.sort(key=lambda item: item[:2], reverse=True)
+    for position, (record_score, _order, record) in enumerate(heap, 1):
+        record['priority_rank'] = position
+        yield position, record_score, encode_json(record)
+
+
+def write(ranked, output_file, high_priority_file, high_threshold):
+    """Write the ranked questions, and the high-priority ones to their own file
+
+    Returns (questions written, high-priority questions written, top questions).
+    """
+    top_questions = []
+    with JsonArrayWriter(output_file) as output, JsonArrayWriter(high_priority_file) as high:
+        for position, record_score, text in ranked:
+            output.write_encoded(text)
+            if record_score >= high_threshold:
+                high.write_encoded(text)
+            if position <= TOP_QUESTIONS_SHOWN:
+                top_questions.append(json.loads(text))
+    return output.count, high.count, top_questions
+
+
+def print_summary(reader, stats, top_questions):
+    scorer = stats.scorer
+    print(f"Found {reader.rows} questions in column '{reader.column}'")
+    if stats.invalid:
+        print(f"  Skipped {stats.invalid} empty or too-short entries")
+    if stats.duplicates:
+        print(f"  Skipped {stats.duplicates} duplicate questions")
+
+    print(f"\n{'='*60}")
+    print("PROCESSING COMPLETE")
+    print(f"{'='*60}")
+    print(f"Total questions processed: {stats.processed}")
+
+    print(f"\nCategory Distribution:")
+    for cat, count in sorted(stats.categories.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {cat}: {count}")
+
+    print(f"\nPriority Distribution:")
+    for label, count in stats.tiers.items():
+        print(f"  {label}: {count}")
+
+    print(f"\n{'='*60}")
+    print(f"TOP {TOP_QUESTIONS_SHOWN} QUESTIONS")
+    print(f"{'='*60}")
+    for i, q in enumerate(top_questions, 1):
+        print(f"\n{i}. [{q['category']}] (Score: {scorer.format_score(q[scorer.score_field])})")
+        print(f"   {q['question'][:100]}...")
+
+
+def run(input_file, output_file, scorer, chunk_size=DEFAULT_CHUNK_SIZE, top=None, deduplicate=True):
+    """Prioritize the questions in input_file, writing ranked JSON to output_file
+
+    Also writes the questions at or above the scorer's high threshold to
+    ``<output>_high_priority.json``. Returns the number of questions written.
+
+    Args:
+        input_file: .xlsx, .xls, .csv or .parquet file of questions
+        output_file: Where to write the prioritized questions
+        scorer: KeywordScorer, EmbeddingScorer or another scorer
+        chunk_size: Rows read and scored at a time
+        top: Only keep the highest-scoring top questions
+        deduplicate: Drop repeated questions (ignoring case and spacing)
+    """
+    print(f"Reading {input_file}...")
+    reader = QuestionReader(input_file, chunk_size)
+    stats = PipelineStats(scorer)
+
+    batches = clean(reader, stats)
+    if deduplicate:
+        batches = dedupe(batches, stats)
+    batches = score(batches, scorer)
+    batches = categorize(batches, scorer)
+    batches = tally(batches, stats)
+
+    high_priority_file = output_file.replace('.json', '_high_priority.json')
+    try:
+        written, high_count, top_questions = write(
+            rank(batches, scorer.score_field, top), output_file, high_priority_file, scorer.high_threshold)
+        scorer.report()
+    finally:
+        scorer.close()
+
+    print_summary(reader, stats, top_questions)
+    print(f"\n✓ Saved {written} questions to: {output_file}")
+    print(f"✓ {high_count} high priority questions saved to: {high_priority_file}")
+    return written
+
+
+def load_prioritized(output_file):
+    """The ranked question records written by run, as a list"""
+    with open(output_file, 'r') as f:
+        return json.load(f)
+
+
+def build_scorer(args):
+    if args.scorer == 'embedding':
+        return EmbeddingScorer(args.model, max(1, args.batch_size),
+                               None if args.no_cache else args.cache, max(1, args.workers))
+    return KeywordScorer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prioritize questions for the Generation Alpha mission')
+    parser.add_argument('input_file', help='Excel (.xlsx/.xls), CSV or Parquet file of questions')
+    parser.add_argument('output_file', nargs='?',
+                        help='Output JSON (default: questions_prioritized.json, or '
+                             'questions_ai_prioritized.json with --scorer embedding)')
+    parser.add_argument('--scorer', choices=sorted(SCORERS), default='keyword',
+                        help='keyword matching, or semantic similarity to the mission themes '
+                             '(needs sentence-transformers) (default: keyword)')
+    parser.add_argument('--top', type=int, metavar='N', help='Only output the N highest-scoring questions')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Do not drop repeated questions')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Rows read from the input at a time (default: {DEFAULT_CHUNK_SIZE})')
+
+    embedding = parser.add_argument_group('embedding scorer')
+    embedding.add_argument('--model', default=DEFAULT_MODEL,
+                           help=f'SentenceTransformer model (default: {DEFAULT_MODEL})')
+    embedding.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                           help=f'Questions encoded per batch (default: {DEFAULT_BATCH_SIZE})')
+    embedding.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                           help=f'Embedding cache database (default: {DEFAULT_CACHE_PATH})')
+    embedding.add_argument('--no-cache', action='store_true', help='Encode everything, ignoring the cache')
+    embedding.add_argument('--workers', type=int, default=1,
+                           help='Encoding processes, each with its own model (default: 1)')
+    args = parser.parse_args(argv)
+
+    if not Path(args.input_file).exists():
+        print(f"Error: File '{args.input_file}' not found")
+        sys.exit(1)
+    if args.top is not None and args.top < 1:
+        parser.error('--top must be at least 1')
+
+    try:
+        run(args.input_file, args.output_file or DEFAULT_OUTPUTS[args.scorer], build_scorer(args),
+            max(1, args.chunk_size), args.top, not args.keep_duplicates)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Ordering of the upcoming-question queue.
+
+Questions are served highest priority first: by the keyword ``priority_score``
+from process_questions, then the semantic ``alignment_score`` from
+process_questions_ai, then import order. To keep a session varied, a
+category is not repeated within ``category_spacing`` questions while another
+category still has questions left. A bank without any scores keeps its import
+order.
+"""
+
+import heapq
+from collections import deque
+
+DEFAULT_CATEGORY_SPACING = 1
+
+
+def priority_key(question):
+    """Sort key putting the highest-priority question first; unscored questions go last"""
+    priority = question.get('priority_score')
+    alignment = question.get('alignment_score')
+    return (priority is None, -(priority or 0), alignment is None, -(alignment or 0),
+            question.get('order_index') or 0, question['id'])
+
+
+def schedule_questions(questions, category_spacing=DEFAULT_CATEGORY_SPACING):
+    """Return the questions in the order they should be asked
+
+    Args:
+        questions: Dicts with 'id', 'category', 'order_index' and optional
+            'priority_score' / 'alignment_score'
+        category_spacing: Questions to wait before repeating a category; 0
+            orders purely by priority. Ignored when no question is scored.
+    """
+    scored = any(q.get('priority_score') is not None or q.get('alignment_score') is not None
+                 for q in questions)
+    if category_spacing <= 0 or not scored:
+        return sorted(questions, key=priority_key)
+
+    by_category = {}
+    for question in sorted(questions, key=priority_key):
+        by_category.setdefault(question.get('category') or '', deque()).append(question)
+
+    # Best remaining question of each category
+    heads = [(priority_key(pending[0]), category) for category, pending in by_category.items()]
+    heapq.heapify(heads)
+    recent = deque(maxlen=category_spacing)
+    ordered = []
+
+    while heads:
+        held = []
+        head = heapq.heappop(heads)
+        while head[1] in recent and heads:
+            held.append(head)
+            head = heapq.heappop(heads)
+        if head[1] in recent:
+            # Every remaining category was used recently; take the best question anyway.
+            held.append(head)
+            held.sort()
+            head = held.pop(0)
+        for item in held:
+            heapq.heappush(heads, item)
+
+        category = head[1]
+        pending = by_category[category]
+        ordered.append(pending.popleft())
+        recent.append(category)
+        if pending:
+            heapq.heappush(heads, (priority_key(pending[0]), category))
+
+    return ordered
@@ -0,0 +1,345 @@
+"""
+Question scoring for the question processing pipeline.
+
+Two interchangeable scorers rank questions by relevance to the mission:
+
+- ``KeywordScorer`` counts mission keywords, with one compiled regex covering
+  every tier and category applied to a whole chunk of questions at once.
+  Matches start at a word boundary, and keywords of three letters or fewer must
+  also end at one, so 'ai' does not match "said" while 'genetic' still matches
+  "genetics".
+- ``EmbeddingScorer`` embeds questions with sentence-transformers and scores
+  their cosine similarity to each mission theme, one matrix multiply per batch.
+
+A scorer turns a Series of question texts into features (``analyze``), then
+features into score fields (``score``) and categories (``categorize``).
+"""
+
+import functools
+import re
+import time
+
+import numpy as np
+
+from embeddings import (
+    DEFAULT_CACHE_PATH, DEFAULT_MODEL, HAS_EMBEDDINGS, CachedEmbedder, Embedder, EmbeddingCache,
+    ParallelEmbedder,
+)
+
+
+# Mission-focused keywords for prioritization
+PRIORITY_KEYWORDS = {
+    'high': [
+        # Technology & Future
+        'technology', 'future', 'innovation', 'ai', 'artificial intelligence',
+        'automation', 'digital', 'virtual', 'augmented', 'biotechnology',
+
+        # Biology & Health
+        'biology', 'health', 'genetic', 'wellness', 'longevity', 'medical',
+        'neuroscience', 'brain', 'body', 'human potential',
+
+        # Humanity & Society
+        'generation', 'children', 'education', 'learning', 'youth', 'future generations',
+        'humanity', 'human', 'society', 'community', 'collective',
+
+        # Alignment & Integration
+        'alignment', 'integration', 'harmony', 'balance', 'synergy', 'convergence',
+        'ethics', 'values', 'wisdom', 'sustainability', 'regenerative',
+
+        # Systems Thinking
+        'systems', 'holistic', 'interconnected', 'ecosystem', 'complex',
+    ],
+    'medium': [
+        'relationship', 'communication', 'collaboration', 'creativity',
+        'consciousness', 'awareness', 'mindfulness', 'purpose', 'meaning',
+        'leadership', 'vision', 'transformation', 'evolution', 'growth',
+        'nature', 'environment', 'planet', 'earth',
+    ],
+    'low': [
+        'personal', 'individual', 'preference', 'opinion', 'favorite',
+        'routine', 'daily', 'habit',
+    ]
+}
+
+
+# Categories in priority order: a question gets the first one it matches
+CATEGORY_KEYWORDS = [
+    ('Technology & Future', ['ai', 'technology', 'digital', 'automation', 'virtual', 'augmented']),
+    ('Biology & Health', ['health', 'biology', 'body', 'brain', 'genetic', 'medical', 'wellness']),
+    ('Generation Alpha & Youth', ['children', 'generation', 'youth', 'education', 'learning', 'young']),
+    ('Systems & Alignment', ['system', 'integration', 'alignment', 'harmony', 'balance', 'holistic']),
+    ('Ethics & Wisdom', ['ethics', 'values', 'wisdom', 'meaning', 'purpose', 'consciousness']),
+    ('Environment & Sustainability', ['environment', 'nature', 'planet', 'sustainability', 'earth', 'climate']),
+    ('Leadership & Vision', ['leadership', 'transform', 'vision', 'change', 'innovation']),
+    ('Personal Growth', ['growth', 'development', 'learning', 'mindset', 'creativity']),
+    ('Relationships & Community', ['relationship', 'community', 'collaboration', 'social', 'connection']),
+]
+DEFAULT_CATEGORY = 'General Wisdom'
+
+# Points per distinct keyword matched in each tier
+TIER_POINTS = {'high': 3, 'medium': 2, 'low': -1}
+
+# Keywords this short must match as whole words
+SHORT_KEYWORD_LENGTH = 3
+
+
+def _keyword_regex(keyword):
+    suffix = r'\b' if len(keyword) <= SHORT_KEYWORD_LENGTH else ''
+    return r'\b' + re.escape(keyword) + suffix
+
+
+class KeywordMatcher:
+    """Single compiled regex matching any of a list of keywords
+
+    Alternatives are tried longest first, so overlapping keywords resolve to
+    the longest one (e.g. 'future generations' over 'future'); the shorter
+    keywords it contains are credited too, so each keyword present in a text
+    counts exactly once.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k.lower() for k in keywords))
+        alternatives = sorted(self.keywords, key=len, reverse=True)
+        # Texts are lowercased before matching, which is much faster than re.IGNORECASE.
+        self.pattern = re.compile('(?:' + '|'.join(_keyword_regex(k) for k in alternatives) + ')')
+        # keyword -> every keyword of the list that also matches inside it
+        self._implied = {
+            keyword: frozenset(k for k in self.keywords if re.search(_keyword_regex(k), keyword))
+            for keyword in self.keywords
+        }
+        self._memo = {}
+
+    def matches(self, text):
+        """Set of keywords found in text"""
+        return self._credit(self.pattern.findall(text.lower()))
+
+    def matches_series(self, texts):
+        """Set of keywords found in each text of a pandas Series"""
+        return [self._credit(found) for found in texts.str.lower().str.findall(self.pattern)]
+
+    def _credit(self, found):
+        key = frozenset(found)
+        credited = self._memo.get(key)
+        if credited is None:
+            credited = frozenset().union(*(self._implied[match] for match in key))
+            self._memo[key] = credited
+        return credited
+
+
+# One pass over each question finds the keywords of every tier and category.
+KEYWORD_MATCHER = KeywordMatcher(
+    [k for keywords in PRIORITY_KEYWORDS.values() for k in keywords] +
+    [k for _category, keywords in CATEGORY_KEYWORDS for k in keywords]
+)
+TIER_KEYWORDS = {tier: frozenset(keywords) for tier, keywords in PRIORITY_KEYWORDS.items()}
+CATEGORY_KEYWORD_SETS = [(category, frozenset(keywords)) for category, keywords in CATEGORY_KEYWORDS]
+
+
+@functools.lru_cache(maxsize=None)
+def _assess(keywords):
+    """(priority score, category) for a set of matched keywords"""
+    score = sum(points * len(keywords & TIER_KEYWORDS[tier]) for tier, points in TIER_POINTS.items())
+    category = next((category for category, words in CATEGORY_KEYWORD_SETS if keywords & words),
+                    DEFAULT_CATEGORY)
+    return max(0, score), category  # Don't go negative
+
+
+def calculate_priority_score(question_text):
+    """Calculate priority score based on keyword matching"""
+    return _assess(KEYWORD_MATCHER.matches(question_text))[0]
+
+
+def categorize_question(question_text):
+    """Categorize question based on content"""
+    return _assess(KEYWORD_MATCHER.matches(question_text))[1]
+
+
+class KeywordScorer:
+    """Scores questions by the mission keywords they contain"""
+
+    name = 'keyword'
+    score_field = 'priority_score'
+    high_threshold = 6
+    # (label, minimum score) from the highest tier down
+    tiers = [
+        ('High Priority (score >= 6)', 6),
+        ('Medium Priority (score 3-5)', 3),
+        ('Low Priority (score < 3)', float('-inf')),
+    ]
+
+    def analyze(self, texts):
+        """Set of matched keywords for each question in a Series"""
+        return KEYWORD_MATCHER.matches_series(texts)
+
+    def score(self, features):
+        scores = np.fromiter((_assess(keywords)[0] for keywords in features), dtype=np.int64,
+                             count=len(features))
+        return {'priority_score': scores}
+
+    def categorize(self, features):
+        return [_assess(keywords)[1] for keywords in features]
+
+    def format_score(self, score):
+        return str(score)
+
+    def report(self):
+        pass
+
+    def close(self):
+        pass
+
+
+DEFAULT_BATCH_SIZE = 256
+
+
+# Mission statement for semantic matching
+MISSION_THEMES = {
+    'technology_alignment': """
+        Advanced technologies, AI, automation, digital transformation,
+        biotechnology, augmented reality, virtual reality, human-computer interaction,
+        technological evolution, innovation for humanity
+    """,
+    'biology_alignment': """
+        Human biology, genetics, neuroscience, health optimization,
+        longevity, wellness, biological systems, brain function,
+        human potential, biohacking, regenerative medicine
+    """,
+    'humanity_alignment': """
+        Human values, ethics, consciousness, collective wisdom,
+        social connection, empathy, compassion, human flourishing,
+        meaning, purpose, spiritual growth, humanity's future
+    """,
+    'generation_alpha': """
+        Future generations, children, youth, education for tomorrow,
+        preparing young minds, generation alpha, next generation,
+        childhood development, learning systems, youth empowerment
+    """,
+    'systems_thinking': """
+        Systems thinking, holistic integration, interconnection,
+        complexity, emergence, synergy, harmony between systems,
+        whole systems design, ecological thinking, integration
+    """
+}
+
+
+# Weight of each theme in the overall mission alignment score
+THEME_WEIGHTS = {
+    'technology_alignment': 1.5,
+    'biology_alignment': 1.5,
+    'humanity_alignment': 1.0,
+    'generation_alpha': 2.0,  # Highest weight
+    'systems_thinking': 1.2,
+}
+
+CATEGORY_MAP = {
+    'technology_alignment': 'Technology & Future',
+    'biology_alignment': 'Biology & Health',
+    'humanity_alignment': 'Ethics & Humanity',
+    'generation_alpha': 'Generation Alpha',
+    'systems_thinking': 'Systems & Integration'
+}
+
+
+class EmbeddingScorer:
+    """Scores questions by semantic similarity to the weighted mission themes
+
+    Args:
+        model_name: SentenceTransformer model
+        batch_size: Questions encoded per batch
+        cache_path: SQLite embedding cache, or None to always encode
+        workers: Encoding processes, each loading its own copy of the model
+    """
+
+    name = 'embedding'
+    score_field = 'alignment_score'
+    high_threshold = 4.0
+    tiers = [
+        ('High Alignment (>= 4.0)', 4.0),
+        ('Medium Alignment (3.0-3.9)', 3.0),
+        ('Lower Alignment (< 3.0)', float('-inf')),
+    ]
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE,
+                 cache_path=DEFAULT_CACHE_PATH, workers=1):
+        if not HAS_EMBEDDINGS:
+            raise RuntimeError('sentence-transformers is not installed '
+                               '(pip install sentence-transformers)')
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache_path = cache_path
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+        # The model itself loads on the first cache miss
+        if workers > 1:
+            self.model_embedder = ParallelEmbedder(model_name, workers=workers, batch_size=batch_size)
+        else:
+            self.model_embedder = Embedder(model_name, batch_size=batch_size)
+        self.embedder = self.model_embedder
+        if cache_path:
+            print(f"Using embedding cache {cache_path}")
+            self.embedder = CachedEmbedder(self.embedder, EmbeddingCache(cache_path))
+
+        self.theme_names = list(MISSION_THEMES)
+        self.theme_weights = np.array([THEME_WEIGHTS[theme] for theme in self.theme_names], dtype=np.float32)
+        self._theme_matrix = None
+
+    @property
+    def theme_matrix(self):
+        # One row per theme, encoded on first use
+        if self._theme_matrix is None:
+            print("Encoding mission themes...")
+            self._theme_matrix = self.embedder.encode([MISSION_THEMES[theme] for theme in self.theme_names])
+        return self._theme_matrix
+
+    def analyze(self, texts):
+        """Cosine similarity of each question in a Series to each theme"""
+        question_texts = texts.tolist()
+        theme_matrix = self.theme_matrix
+        similarities = np.empty((len(question_texts), len(self.theme_names)), dtype=np.float32)
+
+        # Each worker gets a full batch per round
+        batch_rows = self.batch_size * self.workers
+        started = time.perf_counter()
+        for start in range(0, len(question_texts), batch_rows):
+            batch_texts = question_texts[start:start + batch_rows]
+            # Unit vectors, so the product is the cosine similarity to each theme
+            similarities[start:start + len(batch_texts)] = self.embedder.encode(batch_texts) @ theme_matrix.T
+        self.encode_seconds += time.perf_counter() - started
+        self.encoded += len(question_texts)
+        return similarities
+
+    def score(self, features):
+        alignment_scores = features @ self.theme_weights
+        return {
+            'alignment_score': np.array([round(float(score), 3) for score in alignment_scores]),
+            'theme_scores': [{theme: round(float(row[i]), 3) for i, theme in enumerate(self.theme_names)}
+                             for row in features],
+        }
+
+    def categorize(self, features):
+        return [CATEGORY_MAP[self.theme_names[i]] for i in features.argmax(axis=1)]
+
+    def format_score(self, score):
+        return f'{score:.2f}'
+
+    def report(self):
+        if self.encoded:
+            rate = self.encoded / self.encode_seconds if self.encode_seconds else 0
+            print(f"Encoded and scored {self.encoded} questions in {self.encode_seconds:.1f}s "
+                  f"({rate:.1f} questions/sec, batch size {self.batch_size})")
+        if self.cache_path:
+            print(f"Embedding cache: {self.embedder.hits} hits, {self.embedder.misses} newly encoded")
+        if self.workers > 1:
+            for worker, (pid, stats) in enumerate(sorted(self.model_embedder.worker_stats.items()), 1):
+                rate = stats['texts'] / stats['seconds'] if stats['seconds'] else 0
+                print(f"  Worker {worker} (pid {pid}): {stats['texts']} questions, {rate:.1f} questions/sec")
+
+    def close(self):
+        if self.cache_path:
+            self.embedder.cache.close()
+        if self.workers > 1:
+            self.model_embedder.close()
+
+
+SCORERS = {'keyword': KeywordScorer, 'embedding': EmbeddingScorer}
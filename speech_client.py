@@ -0,0 +1,483 @@
+"""
+Resilient, load-balanced clients for the external STT/TTS services.
+
+A backend spreads requests over one or more endpoints (e.g. several Whisper or
+Piper instances). It picks the endpoint with the fewest outstanding requests
+relative to its weight, health-checks endpoints in the background, and ejects
+endpoints that are down or markedly slower than their peers. Each endpoint has
+its own circuit breaker, so a dead instance fails fast while the others keep
+serving. Requests share keep-alive connection pools, the number in flight is
+capped per backend, and transient failures are retried with jittered
+exponential backoff on a different endpoint where possible.
+
+``SpeechBackend`` is the synchronous (requests) client used from Flask views;
+``AsyncSpeechBackend`` wraps the shared httpx client of an AsyncSpeechRuntime.
+Both take a ``send`` callable that performs one attempt against a base URL, so
+the same policy applies to any endpoint.
+"""
+
+import asyncio
+import itertools
+import random
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+
+class BackendBusyError(RuntimeError):
+    """Raised when no request slot frees up within the queue timeout"""
+
+
+# Transport-level failures worth retrying; HTTP errors are judged by status.
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, httpx.TransportError)
+
+
+def is_retryable(exc):
+    """True for connection problems, timeouts, 429 and 5xx responses"""
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after a cooldown"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probing:
+                # Let exactly one request test whether the backend recovered.
+                self._probing = True
+                return
+        raise CircuitOpenError('Speech backend unavailable (circuit open)')
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def record_abandoned(self):
+        """A call ended without a verdict (cancelled); let another request probe"""
+        with self._lock:
+            self._probing = False
+
+
+class RetryPolicy:
+    """How many attempts to make and how long to back off between them"""
+
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_max=8.0):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff before retrying after attempt N"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+def auth_headers(api_key):
+    return {"Authorization": f"Bearer {api_key}"} if api_key and api_key != "none" else {}
+
+
+def parse_endpoints(spec):
+    """Parse ``url[|weight],url[|weight],...`` into (url, weight) pairs"""
+    endpoints = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition('|')
+        endpoints.append((url.strip().rstrip('/'), float(weight) if weight else 1.0))
+    return endpoints
+
+
+class Endpoint:
+    """One instance of a speech service and its live load/health state"""
+
+    def __init__(self, base_url, weight=1.0, breaker=None, health_path='/health'):
+        self.base_url = base_url.rstrip('/')
+        self.weight = weight
+        self.breaker = breaker or CircuitBreaker()
+        parts = urlsplit(self.base_url)
+        self.health_url = f'{parts.scheme}://{parts.netloc}{health_path}'
+        self.outstanding = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.latency = None         # EWMA of successful request latency, seconds
+        self.samples = 0
+        self.last_picked = 0
+
+    def available(self, now):
+        return self.healthy and now >= self.ejected_until and self.breaker.state != 'open'
+
+    def __repr__(self):
+        return f'Endpoint({self.base_url!r}, weight={self.weight})'
+
+
+class EndpointPool:
+    """Least-outstanding-requests selection over weighted endpoints
+
+    Args:
+        name: Label used in log messages
+        endpoints: List of (base_url, weight) pairs
+        breaker_factory: Callable returning a CircuitBreaker per endpoint
+        health_path: Path on each endpoint's origin polled by health checks
+        slow_factor: Eject an endpoint whose latency exceeds this multiple of
+            the median of its peers
+        eject_seconds: How long an ejected endpoint sits out
+        min_samples: Successful requests needed before latency is judged
+    """
+
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, name, endpoints, breaker_factory=CircuitBreaker, health_path='/health',
+                 slow_factor=3.0, eject_seconds=30.0, min_samples=5):
+        if not endpoints:
+            raise ValueError(f'{name} backend needs at least one endpoint')
+        self.name = name
+        self.endpoints = [Endpoint(url, weight, breaker_factory(), health_path)
+                          for url, weight in endpoints]
+        self.slow_factor = slow_factor
+        self.eject_seconds = eject_seconds
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._picks = itertools.count(1)
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    def acquire(self, exclude=()):
+        """Reserve the least loaded available endpoint, preferring ones not in exclude"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.available(now)]
+            fresh = [e for e in candidates if e not in exclude]
+            candidates = fresh or candidates
+
+            while candidates:
+                # Outstanding load per unit of weight; ties go to the least recently picked.
+                best = min(candidates, key=lambda e: ((e.outstanding + 1) / e.weight, e.last_picked))
+                try:
+                    best.breaker.before_call()
+                except CircuitOpenError:
+                    # Half-open endpoint whose single probe is already in flight.
+                    candidates.remove(best)
+                    continue
+                best.outstanding += 1
+                best.last_picked = next(self._picks)
+                return best
+
+        raise CircuitOpenError(f'No healthy {self.name} endpoints available')
+
+    def release(self, endpoint, elapsed, outcome):
+        """Return an endpoint after a request
+
+        outcome is 'ok', 'failure' (backend fault), 'client_error' (the
+        backend answered, but the request itself was rejected) or
+        'cancelled' (the caller gave up; nothing is learned about the backend).
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+
+        if outcome == 'cancelled':
+            endpoint.breaker.record_abandoned()
+            return
+        if outcome == 'failure':
+            endpoint.breaker.record_failure()
+            return
+
+        endpoint.breaker.record_success()
+        if outcome == 'ok':
+            self._record_latency(endpoint, elapsed)
+
+    def _record_latency(self, endpoint, elapsed):
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = elapsed
+            else:
+                endpoint.latency += self.LATENCY_ALPHA * (elapsed - endpoint.latency)
+            endpoint.samples += 1
+
+            if endpoint.samples < self.min_samples:
+                return
+            now = time.monotonic()
+            peers = [e.latency for e in self.endpoints
+                     if e is not endpoint and e.available(now) and e.latency is not None
+                     and e.samples >= self.min_samples]
+            if not peers:
+                return
+            baseline = statistics.median(peers)
+            if endpoint.latency > self.slow_factor * baseline:
+                endpoint.ejected_until = now + self.eject_seconds
+                # Start fresh when it rejoins rather than being judged on stale samples.
+                endpoint.latency = None
+                endpoint.samples = 0
+                print(f"{self.name} endpoint {endpoint.base_url} ejected for "
+                      f"{self.eject_seconds:.0f}s (slow: {elapsed:.2f}s vs peer median {baseline:.2f}s)")
+
+    def check_health(self, timeout=2.0):
+        """Probe every endpoint's health URL once
+
+        Any answer below 500 counts as healthy, so servers without a health
+        route (404) are judged on reachability alone.
+        """
+        for endpoint in self.endpoints:
+            try:
+                with requests.get(endpoint.health_url, timeout=timeout) as resp:
+                    healthy = resp.status_code < 500
+            except requests.RequestException:
+                healthy = False
+            if healthy != endpoint.healthy:
+                state = 'healthy' if healthy else 'unhealthy'
+                print(f"{self.name} endpoint {endpoint.base_url} is {state}")
+            endpoint.healthy = healthy
+
+    def start_health_checks(self, interval=10.0):
+        """Poll endpoint health in a daemon thread every interval seconds"""
+        if self._health_thread is not None or interval <= 0:
+            return
+
+        def run():
+            self.check_health()
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=run, name=f'{self.name}-health', daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """Current state of each endpoint, for diagnostics"""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'base_url': e.base_url,
+                'weight': e.weight,
+                'outstanding': e.outstanding,
+                'healthy': e.healthy,
+                'ejected': now < e.ejected_until,
+                'breaker': e.breaker.state,
+                'latency_ms': round(e.latency * 1000, 1) if e.latency is not None else None,
+            } for e in self.endpoints]
+
+
+class SpeechBackend:
+    """Synchronous client for a speech service
+
+    Args:
+        name: Label used in log messages
+        pool: EndpointPool to balance requests over
+        api_key: Bearer token, or ``none``
+        max_inflight: Requests allowed in flight at once across all endpoints
+        timeout: ``(connect, read)`` timeout in seconds
+        queue_timeout: Seconds to wait for a free request slot
+        retry: RetryPolicy
+    """
+
+    def __init__(self, name, pool, api_key='none', max_inflight=8, timeout=(5, 120),
+                 queue_timeout=30.0, retry=None):
+        self.name = name
+        self.pool = pool
+        self.headers = auth_headers(api_key)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.retry = retry or RetryPolicy()
+        self._slots = threading.BoundedSemaphore(max_inflight)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(pool.endpoints), pool_maxsize=max_inflight,
+                              max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def call(self, send, stream=False):
+        """Run ``send(session, base_url, headers, timeout)`` with balancing, limits and retries
+
+        ``send`` must return a requests.Response. For ``stream=True`` the
+        request slot stays held until the returned response is closed.
+        """
+        tried = []
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                raise BackendBusyError(f'{self.name} backend is at its concurrency limit')
+            release_slot = _once(self._slots.release)
+
+            try:
+                endpoint = self.pool.acquire(exclude=tried)
+            except CircuitOpenError:
+                release_slot()
+                raise
+            tried.append(endpoint)
+
+            started = time.monotonic()
+            resp = None
+            try:
+                resp = send(self.session, endpoint.base_url, self.headers, self.timeout)
+                resp.raise_for_status()
+            except Exception as e:
+                if resp is not None:
+                    resp.close()
+                release_slot()
+                retryable = is_retryable(e)
+                # A client error means the service answered; it says nothing about its health.
+                self.pool.release(endpoint, time.monotonic() - started,
+                                  'failure' if retryable else 'client_error')
+                if not retryable or attempt >= self.retry.max_attempts:
+                    raise
+                print(f"{self.name} request to {endpoint.base_url} failed ({str(e)}); "
+                      f"retrying (attempt {attempt + 1})")
+                time.sleep(self.retry.delay(attempt))
+                continue
+
+            self.pool.release(endpoint, time.monotonic() - started, 'ok')
+            if stream:
+                _release_on_close(resp, release_slot)
+            else:
+                release_slot()
+            return resp
+
+    def close(self):
+        self.pool.stop()
+        self.session.close()
+
+
+class AsyncSpeechBackend:
+    """Async client for a speech service on an AsyncSpeechRuntime's shared httpx client
+
+    Takes the same arguments as SpeechBackend, plus the runtime whose loop and
+    connection pool it uses.
+    """
+
+    def __init__(self, name, pool, runtime, api_key='none', max_inflight=8,
+                 queue_timeout=30.0, retry=None):
+        self.name = name
+        self.pool = pool
+        self.headers = auth_headers(api_key)
+        self.runtime = runtime
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+        self.retry = retry or RetryPolicy()
+        self._slots = None
+
+    async def call(self, send):
+        """Await ``send(client, base_url, headers)`` with balancing, limits and retries
+
+        ``send`` must return an httpx.Response that has been read.
+        """
+        # Created on first use so it belongs to the runtime's loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_inflight)
+
+        tried = []
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise BackendBusyError(f'{self.name} backend is at its concurrency limit')
+
+            try:
+                endpoint = self.pool.acquire(exclude=tried)
+                tried.append(endpoint)
+                started = time.monotonic()
+                # Stays 'cancelled' if the task is cancelled mid-request
+                # (CancelledError is not an Exception); the endpoint is
+                # returned on every path.
+                outcome = 'cancelled'
+                try:
+                    resp = await send(self.runtime.client, endpoint.base_url, self.headers)
+                    resp.raise_for_status()
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    outcome = 'failure' if retryable else 'client_error'
+                    if not retryable or attempt >= self.retry.max_attempts:
+                        raise
+                    print(f"{self.name} request to {endpoint.base_url} failed ({str(e)}); "
+                          f"retrying (attempt {attempt + 1})")
+                else:
+                    outcome = 'ok'
+                    return resp
+                finally:
+                    self.pool.release(endpoint, time.monotonic() - started, outcome)
+            finally:
+                self._slots.release()
+
+            await asyncio.sleep(self.retry.delay(attempt))
+
+    def close(self):
+        self.pool.stop()
+
+
+def _once(func):
+    """Wrap func so only the first call has any effect"""
+    lock = threading.Lock()
+    called = False
+
+    def wrapper():
+        nonlocal called
+        with lock:
+            if called:
+                return
+            called = True
+        func()
+
+    return wrapper
+
+
+def _release_on_close(resp, release):
+    """Run release once the streamed response is closed"""
+    original_close = resp.close
+
+    def close():
+        try:
+            original_close()
+        finally:
+            release()
+
+    resp.close = close
@@ -0,0 +1,127 @@
+"""
+Speech service configuration shared by the app and the batch scripts.
+
+Reads the SPEECH_* environment variables and builds the endpoint pools, the
+TTS backend and the synthesized-audio cache. Scripts such as prewarm_tts.py
+use it to synthesize questions without the app's own startup (database
+pool, STT runtime, background queues).
+"""
+
+import os
+
+from speech_client import CircuitBreaker, EndpointPool, RetryPolicy, SpeechBackend, parse_endpoints
+from tts_cache import TTSCache
+
+# OpenAI-compatible speech service configuration
+# SPEECH_*_BASE_URLS takes a comma-separated list of "url" or "url|weight" entries
+# to balance across several instances; otherwise the single BASE_URL is used.
+STT_ENDPOINTS = parse_endpoints(
+    os.getenv("SPEECH_STT_BASE_URLS") or os.getenv("SPEECH_STT_BASE_URL", "http://localhost:5002/v1")
+)
+STT_API_KEY = os.getenv("SPEECH_STT_API_KEY", "none")
+STT_MODEL = os.getenv("SPEECH_STT_MODEL", "whisper-1")
+
+TTS_ENDPOINTS = parse_endpoints(
+    os.getenv("SPEECH_TTS_BASE_URLS") or os.getenv("SPEECH_TTS_BASE_URL", "http://localhost:5001/v1")
+)
+TTS_API_KEY = os.getenv("SPEECH_TTS_API_KEY", "none")
+TTS_MODEL = os.getenv("SPEECH_TTS_MODEL", "piper")
+TTS_VOICE = os.getenv("SPEECH_TTS_VOICE", "en_US-lessac-medium")
+TTS_RESPONSE_FORMAT = os.getenv("SPEECH_TTS_RESPONSE_FORMAT", "mp3")
+
+# Fail fast when a speech service is unreachable instead of waiting for the read timeout
+SPEECH_CONNECT_TIMEOUT = float(os.getenv("SPEECH_CONNECT_TIMEOUT", "5"))
+
+# Bytes relayed per chunk when streaming synthesized audio (bounds worker memory)
+TTS_STREAM_CHUNK_SIZE = int(os.getenv("SPEECH_TTS_STREAM_CHUNK_KB", "32")) * 1024
+
+
+def retry_policy():
+    return RetryPolicy(max_attempts=int(os.getenv("SPEECH_RETRY_ATTEMPTS", "3")))
+
+
+def circuit_breaker():
+    return CircuitBreaker(
+        failure_threshold=int(os.getenv("SPEECH_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("SPEECH_BREAKER_RESET_SECONDS", "30")),
+    )
+
+
+def endpoint_pool(name, endpoints, health_checks=True):
+    """Endpoint pool for a speech service, optionally probing endpoint health in the background"""
+    pool = EndpointPool(
+        name,
+        endpoints,
+        breaker_factory=circuit_breaker,
+        health_path=os.getenv("SPEECH_HEALTH_PATH", "/health"),
+        slow_factor=float(os.getenv("SPEECH_SLOW_FACTOR", "3")),
+        eject_seconds=float(os.getenv("SPEECH_EJECT_SECONDS", "30")),
+    )
+    if health_checks:
+        pool.start_health_checks(float(os.getenv("SPEECH_HEALTH_INTERVAL", "10")))
+    return pool
+
+
+def describe_endpoints(endpoints):
+    return ", ".join(url if weight == 1 else f"{url} (weight {weight:g})" for url, weight in endpoints)
+
+
+def build_tts_cache():
+    """Synthesized audio cache; question prompts are static, so repeats skip the TTS service"""
+    return TTSCache(
+        cache_dir=os.getenv("SPEECH_TTS_CACHE_DIR", "tts_cache"),
+        max_bytes=int(os.getenv("SPEECH_TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    )
+
+
+def build_tts_backend(health_checks=True):
+    """TTS backend: load-balanced endpoints, pooled connections, in-flight limit,
+    retries and per-endpoint circuit breakers"""
+    return SpeechBackend(
+        "TTS",
+        endpoint_pool("TTS", TTS_ENDPOINTS, health_checks),
+        api_key=TTS_API_KEY,
+        max_inflight=int(os.getenv("SPEECH_TTS_MAX_INFLIGHT", "8")),
+        timeout=(SPEECH_CONNECT_TIMEOUT, 120),
+        retry=retry_policy(),
+    )
+
+
+def request_speech(tts_backend, text, voice):
+    """Start a streaming synthesis request against the TTS backend"""
+    def send(session, base_url, headers, timeout):
+        return session.post(
+            f"{base_url}/audio/speech",
+            headers={
+                **headers,
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": TTS_MODEL,
+                "input": text,
+                "voice": voice,
+                "response_format": TTS_RESPONSE_FORMAT,
+            },
+            timeout=timeout,
+            stream=True,
+        )
+
+    return tts_backend.call(send, stream=True)
+
+
+def iter_speech_chunks(tts_resp):
+    """Yield synthesized audio in bounded chunks, releasing the connection at the end"""
+    try:
+        yield from tts_resp.iter_content(chunk_size=TTS_STREAM_CHUNK_SIZE)
+    finally:
+        tts_resp.close()
+
+
+def cached_speech(tts_backend, tts_cache, text, voice):
+    """Return (cache key, file path) for text, synthesizing it on a cache miss"""
+    key = TTSCache.make_key(text, voice, TTS_MODEL, TTS_RESPONSE_FORMAT)
+    path = tts_cache.get(key, TTS_RESPONSE_FORMAT)
+    if path is None:
+        chunks = iter_speech_chunks(request_speech(tts_backend, text, voice))
+        path = tts_cache.put(key, TTS_RESPONSE_FORMAT, chunks)
+    return key, path
@@ -3,6 +3,7 @@ const API_BASE = '';
 
 // State management
 let currentQuestion = null;
+let upcomingQuestions = [];
 let mediaRecorder = null;
 let audioChunks = [];
 let recordingStartTime = null;
@@ -118,6 +119,7 @@ async function loadCurrentQuestion() {
 
         if (data.success && data.question) {
             currentQuestion = data.question;
+            upcomingQuestions = data.upcoming || [];
             displayQuestion(data.question);
             showState('question');
         } else {
@@ -154,34 +156,29 @@ async function playQuestionAudio() {
         return;
     }
 
+    const resetButton = () => {
+        playQuestionBtn.disabled = false;
+        playQuestionBtn.innerHTML = '<span class="btn-icon">🔊</span> Listen to Question';
+    };
+
     try {
         playQuestionBtn.disabled = true;
         playQuestionBtn.innerHTML = '<span class="btn-icon">⏳</span> Generating...';
 
-        const response = await fetch(`${API_BASE}/api/speak`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ text: currentQuestion.question_text })
-        });
-
-        if (!response.ok) {
-            const err = await response.json().catch(() => ({}));
-            throw new Error(err.error || `TTS request failed (${response.status})`);
-        }
-
-        const audioBlob = await response.blob();
-        const audioUrl = URL.createObjectURL(audioBlob);
-        const audio = new Audio(audioUrl);
-        audio.onended = () => URL.revokeObjectURL(audioUrl);
-        audio.play();
+        // Point the audio element at the streaming endpoint so playback starts
+        // as soon as the first chunks arrive instead of after full synthesis.
+        const params = new URLSearchParams({ text: currentQuestion.question_text });
+        const audio = new Audio(`${API_BASE}/api/speak?${params}`);
+        audio.onplaying = resetButton;
+        audio.onerror = () => {
+            resetButton();
+            alert('Failed to generate question audio. Please check the TTS service.');
+        };
+        await audio.play();
     } catch (error) {
         console.error('Error generating question audio:', error);
         alert(`Failed to generate question audio: ${error.message}`);
-    } finally {
-        playQuestionBtn.disabled = false;
-        playQuestionBtn.innerHTML = '<span class="btn-icon">🔊</span> Listen to Question';
+        resetButton();
     }
 }
 
@@ -257,20 +254,25 @@ async function transcribeAudio(audioBlob) {
         const formData = new FormData();
         formData.append('audio', audioBlob, 'recording.wav');
         formData.append('question_id', currentQuestion.id);
+        formData.append('mode', 'async');
 
+        // The upload is stored and queued immediately; the transcription
+        // arrives later through the job's event stream.
         const response = await fetch(`${API_BASE}/api/transcribe`, {
             method: 'POST',
             body: formData
         });
 
         const data = await response.json();
+        const job = data.success ? await waitForTranscriptionJob(data) : null;
 
         processingState.style.display = 'none';
 
-        if (data.success) {
-            displayTranscription(data.transcription);
+        if (job && job.status === 'done') {
+            displayTranscription(job.transcription);
         } else {
-            alert('Transcription failed: ' + (data.error || 'Unknown error'));
+            const error = job ? job.error : data.error;
+            alert('Transcription failed: ' + (error || 'Unknown error'));
             resetRecordingUI();
         }
     } catch (error) {
@@ -281,6 +283,47 @@ async function transcribeAudio(audioBlob) {
     }
 }
 
+// Wait for a background transcription job to finish (SSE, falling back to polling)
+function waitForTranscriptionJob(queued) {
+    return new Promise((resolve, reject) => {
+        const isFinished = (job) => job.status === 'done' || job.status === 'failed';
+
+        const poll = async () => {
+            try {
+                const response = await fetch(`${API_BASE}${queued.status_url}`);
+                const data = await response.json();
+                if (!data.success) {
+                    reject(new Error(data.error || 'Job lookup failed'));
+                } else if (isFinished(data.job)) {
+                    resolve(data.job);
+                } else {
+                    setTimeout(poll, 1000);
+                }
+            } catch (error) {
+                reject(error);
+            }
+        };
+
+        if (!window.EventSource) {
+            poll();
+            return;
+        }
+
+        const events = new EventSource(`${API_BASE}${queued.events_url}`);
+        events.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            if (isFinished(job)) {
+                events.close();
+                resolve(job);
+            }
+        };
+        events.onerror = () => {
+            events.close();
+            poll();
+        };
+    });
+}
+
 // Display transcription
 function displayTranscription(text) {
     transcriptionText.textContent = text;
@@ -301,14 +344,39 @@ function retryRecording() {
     resetRecordingUI();
 }
 
-// Move to next question
+// Move to next question, showing the prefetched one while the server catches up
 async function moveToNextQuestion() {
+    const previous = currentQuestion;
+    const prefetched = upcomingQuestions.shift();
+    if (prefetched) {
+        currentQuestion = prefetched;
+        displayQuestion(prefetched);
+    }
+
     try {
-        await fetch(`${API_BASE}/api/next-question`, {
-            method: 'POST'
+        const response = await fetch(`${API_BASE}/api/next-question`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ question_id: previous ? previous.id : null })
         });
+        const data = await response.json();
 
-        await loadCurrentQuestion();
+        if (data.success && data.question) {
+            upcomingQuestions = data.upcoming || [];
+            if (!currentQuestion || currentQuestion.id !== data.question.id) {
+                // The queue changed (e.g. questions imported); follow the server
+                currentQuestion = data.question;
+                displayQuestion(data.question);
+            } else {
+                currentQuestion = data.question;
+                questionNumber.textContent = `Question ${data.question.current_index + 1} of ${data.question.total_questions}`;
+            }
+            showState('question');
+        } else {
+            currentQuestion = null;
+            upcomingQuestions = [];
+            showState('complete');
+        }
         await updateStats();
     } catch (error) {
         console.error('Error moving to next question:', error);
@@ -375,13 +443,22 @@ async function importQuestions() {
 // View all responses
 async function viewAllResponses() {
     try {
-        const response = await fetch(`${API_BASE}/api/responses`);
-        const data = await response.json();
+        // Walk the keyset-paginated endpoint until the cursor runs out
+        const responses = [];
+        let afterId = null;
+        do {
+            const query = afterId === null ? '' : `?after_id=${afterId}`;
+            const response = await fetch(`${API_BASE}/api/responses${query}`);
+            const data = await response.json();
+            if (!data.success) {
+                return;
+            }
+            responses.push(...data.responses);
+            afterId = data.next_after_id;
+        } while (afterId !== null && afterId !== undefined);
 
-        if (data.success) {
-            displayResponses(data.responses);
-            openModal(responsesModal);
-        }
+        displayResponses(responses);
+        openModal(responsesModal);
     } catch (error) {
         console.error('Error loading responses:', error);
         alert('Failed to load responses.');
@@ -0,0 +1,19 @@
+from database import KnowledgeDB
+
+
+def test_import_after_reset_keeps_restarted_session(tmp_path):
+    db = KnowledgeDB(str(tmp_path / 'knowledge.db'))
+    try:
+        db.import_questions([{'question': f'Question {i}', 'category': 'General'} for i in range(6)])
+        for question in db.get_upcoming_questions(6):
+            db.save_response(question['id'], 'answer')
+            db.advance_to_next_question(question['id'])
+        assert db.get_upcoming_questions(10) == []
+
+        db.reset_progress()
+        db.import_questions(['Question 6'])
+
+        texts = [q['question_text'] for q in db.get_upcoming_questions(10)]
+        assert sorted(texts) == [f'Question {i}' for i in range(7)]
+    finally:
+        db.close()
@@ -0,0 +1,131 @@
+"""
+Background transcription queue.
+
+Uploads are persisted and recorded as rows in ``transcription_jobs`` before the
+HTTP request returns. Jobs then run on the shared speech event loop, at most
+``max_concurrency`` at a time so the STT host is never flooded, and failed
+attempts are retried with jittered exponential backoff.
+"""
+
+import asyncio
+import random
+import threading
+
+TERMINAL_STATUSES = ('done', 'failed')
+
+
+class TranscriptionQueue:
+    """Runs transcription jobs stored in KnowledgeDB on an AsyncSpeechRuntime
+
+    Args:
+        db: KnowledgeDB holding the job rows
+        runtime: AsyncSpeechRuntime whose loop executes the jobs
+        transcribe: Callable taking an audio path and returning a coroutine
+            that resolves to the transcription text
+        max_concurrency: Jobs allowed to call the STT service at once
+        max_attempts: Attempts before a job is marked failed
+        backoff_base: Delay in seconds before the first retry; doubles each time
+        backoff_max: Upper bound on the retry delay
+        on_complete: Optional callable run with (job_id, response_id) after
+            a job's response is saved
+    """
+
+    def __init__(self, db, runtime, transcribe, max_concurrency=2, max_attempts=4,
+                 backoff_base=2.0, backoff_max=60.0, on_complete=None):
+        self.db = db
+        self.runtime = runtime
+        self.transcribe = transcribe
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_complete = on_complete
+        self._semaphore = None
+        self._version = 0
+        self._changed = threading.Condition()
+
+    def enqueue(self, question_id, audio_path):
+        """Create a job for an already-persisted upload and schedule it"""
+        job_id = self.db.create_transcription_job(question_id, audio_path)
+        self._schedule(job_id)
+        return job_id
+
+    def resume_pending(self):
+        """Reschedule jobs left queued or running by a previous process"""
+        jobs = self.db.get_unfinished_transcription_jobs()
+        for job in jobs:
+            self._schedule(job['id'])
+        return len(jobs)
+
+    @property
+    def version(self):
+        """Counter bumped whenever any job changes state"""
+        return self._version
+
+    def wait_for_change(self, since_version, timeout=None):
+        """Block until a job changes after since_version; False on timeout"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._version != since_version, timeout)
+
+    def _notify(self):
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    def _schedule(self, job_id, delay=0):
+        self.runtime.submit(self._run(job_id, delay))
+
+    def _retry_delay(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        # Full jitter spreads retries from a burst of failures apart.
+        return random.uniform(delay / 2, delay)
+
+    @staticmethod
+    async def _call(func, *args):
+        """Run a blocking DB call off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _run(self, job_id, delay):
+        if delay:
+            await asyncio.sleep(delay)
+
+        # Created on first use so it belongs to the runtime's loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            job = await self._call(self.db.get_transcription_job, job_id)
+            if job is None or job['status'] in TERMINAL_STATUSES:
+                return
+
+            # Another process resuming the same job may have claimed it first.
+            if not await self._call(self.db.start_transcription_job, job_id, job['attempts']):
+                return
+            self._notify()
+            attempts = job['attempts'] + 1
+
+            try:
+                transcription = await self.transcribe(job['audio_path'])
+                # Saving can fail too (locked or full disk); that counts as a failed attempt.
+                response_id = await self._call(self.db.complete_transcription_job, job_id, transcription)
+            except Exception as e:
+                await self._attempt_failed(job_id, attempts, e)
+                return
+
+            self._notify()
+            if self.on_complete is not None:
+                self.on_complete(job_id, response_id)
+
+    async def _attempt_failed(self, job_id, attempts, error):
+        """Record a failed attempt and schedule the retry, if any"""
+        retry = attempts < self.max_attempts
+        print(f"Transcription job {job_id} attempt {attempts} failed: {str(error)}")
+        try:
+            await self._call(self.db.fail_transcription_job, job_id, str(error), retry)
+        except Exception as e:
+            # The job is left 'running'; the retry below, or resume_pending at
+            # the next start, picks it up again.
+            print(f"Transcription job {job_id} status could not be saved: {str(e)}")
+        self._notify()
+        if retry:
+            self._schedule(job_id, self._retry_delay(attempts))
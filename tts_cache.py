@@ -0,0 +1,186 @@
+"""
+Content-addressed on-disk cache for synthesized question audio.
+
+Entries are keyed on (text, voice, model, response_format), so every playback
+of the same prompt after the first is served from disk without calling the TTS
+service. Total size is bounded; the least recently used entries are evicted
+first. Several processes (app workers, prewarm_tts.py) can share one cache
+directory: lookups fall back to the file system, and eviction works from what
+is actually on disk.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'aac': 'audio/aac',
+    'pcm': 'audio/L16',
+}
+
+# Temp files older than this are left over from an interrupted write rather
+# than being written by another process right now
+STALE_TMP_SECONDS = 3600
+
+
+class TTSCache:
+    """Size-bounded LRU cache of audio files under cache_dir"""
+
+    def __init__(self, cache_dir='tts_cache', max_bytes=512 * 1024 * 1024):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # path -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(text, voice, model, response_format):
+        """Stable content address for a synthesis request"""
+        payload = json.dumps([text, voice, model, response_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def mimetype_for(response_format):
+        return AUDIO_MIMETYPES.get(response_format, 'application/octet-stream')
+
+    def path_for(self, key, response_format):
+        # Two-character shards keep directories small.
+        return os.path.join(self.cache_dir, key[:2], f'{key}.{response_format}')
+
+    def _load(self):
+        """Remove interrupted writes and index existing entries"""
+        stale = time.time() - STALE_TMP_SECONDS
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < stale:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._evict()
+
+    def _scan(self):
+        """Entries on disk as (mtime, path, size), oldest access first"""
+        found = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Evicted by another process while walking
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        return sorted(found)
+
+    def get(self, key, response_format):
+        """Return the cached file path, marking it recently used, or None"""
+        path = self.path_for(key, response_format)
+        with self._lock:
+            if path not in self._entries:
+                # May have been written by another process sharing the directory
+                try:
+                    size = os.stat(path).st_size
+                except FileNotFoundError:
+                    return None
+                self._entries[path] = size
+                self._total_bytes += size
+            self._entries.move_to_end(path)
+
+        try:
+            # mtime doubles as the access time so LRU order survives restarts.
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(path)
+            return None
+        return path
+
+    def put(self, key, response_format, chunks):
+        """Store audio from an iterable of byte chunks; returns the cached file path"""
+        for _chunk in self.write_through(key, response_format, chunks):
+            pass
+        return self.path_for(key, response_format)
+
+    def write_through(self, key, response_format, chunks):
+        """Yield chunks unchanged while writing them to the cache
+
+        The entry is committed only once the iterable is exhausted; if the
+        consumer stops early (e.g. the client disconnects) the partial file is
+        discarded.
+        """
+        path = self.path_for(key, response_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                self.commit(tmp_path, path)
+            else:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+
+    def commit(self, tmp_path, path):
+        """Atomically move a fully written temp file into place and index it"""
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._forget(path)
+            self._entries[path] = size
+            self._total_bytes += size
+            self._evict()
+        return path
+
+    def _forget(self, path):
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes
+
+        The index is first rebuilt from the directory, since other processes
+        add and evict entries too; mtime is the access time, so the LRU order
+        is shared between them.
+        """
+        self._entries = OrderedDict((path, size) for _mtime, path, size in self._scan())
+        self._total_bytes = sum(self._entries.values())
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
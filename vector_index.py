@@ -0,0 +1,257 @@
+"""
+Memory-mapped vector index for semantic search over responses.
+
+Vectors are L2-normalized and stored as float16 (or float32) rows in a flat
+file, next to a parallel file of int64 response ids. New vectors are appended
+to the end of both files, so the index grows without a rebuild, and searches
+run against a read-only memory map: cosine similarity is a dot product,
+computed in blocks so a float16 matrix is never converted to float32 all at
+once. float16 halves the disk and page cache footprint; float32 skips the
+conversion and searches roughly five times faster.
+
+``SemanticIndexer`` keeps an index in step with the responses table on a
+background thread, using the response id as a watermark; responses without
+text move the watermark too, without being embedded.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+SEARCH_BLOCK_ROWS = 65536
+VECTOR_DTYPES = ('float16', 'float32')
+IDS_FILE = 'ids.i64'
+META_FILE = 'meta.json'
+WATERMARK_FILE = 'watermark.json'
+
+
+class VectorIndex:
+    """Appendable on-disk index of (id, unit vector) pairs
+
+    Args:
+        index_dir: Directory holding the vector, id and metadata files
+        dim: Vector dimension
+        model: Embedding model name, recorded so vectors from different
+            models are never mixed in one index
+        dtype: 'float16' or 'float32' storage
+    """
+
+    def __init__(self, index_dir, dim, model=None, dtype='float16'):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f'Unsupported vector dtype: {dtype}')
+        self.index_dir = index_dir
+        self.dim = dim
+        self.model = model
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(index_dir, f'vectors.{dtype}')
+        self.ids_path = os.path.join(index_dir, IDS_FILE)
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._ids = None
+        self._mapped = 0
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._check_meta()
+        self._count = self._recover()
+        self.max_id = max(int(self._snapshot()[1].max()) if self._count else 0, self._read_watermark())
+
+    def _check_meta(self):
+        meta_path = os.path.join(self.index_dir, META_FILE)
+        meta = {'dim': self.dim, 'model': self.model, 'dtype': self.dtype.name}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(f'Vector index in {self.index_dir} was built with {existing}, '
+                                 f'not {meta}; delete the directory to rebuild it')
+        else:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+    def _read_watermark(self):
+        try:
+            with open(os.path.join(self.index_dir, WATERMARK_FILE), 'r', encoding='utf-8') as f:
+                return int(json.load(f)['max_id'])
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def advance(self, max_id):
+        """Record that every id up to max_id has been seen, embedded or not"""
+        with self._lock:
+            if max_id <= self.max_id:
+                return
+            self.max_id = max_id
+            path = os.path.join(self.index_dir, WATERMARK_FILE)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'max_id': max_id}, f)
+            os.replace(path + '.tmp', path)
+
+    def _recover(self):
+        """Count complete rows, trimming any half-written append"""
+        for path in (self.vectors_path, self.ids_path):
+            open(path, 'ab').close()
+        row_bytes = self.dim * self.dtype.itemsize
+        count = min(os.path.getsize(self.vectors_path) // row_bytes,
+                    os.path.getsize(self.ids_path) // 8)
+        for path, size in ((self.vectors_path, count * row_bytes), (self.ids_path, count * 8)):
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+        return count
+
+    def __len__(self):
+        return self._count
+
+    def add(self, ids, vectors):
+        """Append vectors (normalized here) for the given ids"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors differ in length')
+        if not len(ids):
+            return
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            # Vectors first: _recover trims rows that lack an id.
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.astype(self.dtype).tobytes())
+            with open(self.ids_path, 'ab') as f:
+                f.write(ids.tobytes())
+            self._count += len(ids)
+            self.max_id = max(self.max_id, int(ids.max()))
+
+    def _snapshot(self):
+        """Memory maps covering every row added so far"""
+        with self._lock:
+            if self._mapped != self._count:
+                self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r',
+                                          shape=(self._count, self.dim))
+                self._ids = np.memmap(self.ids_path, dtype=np.int64, mode='r', shape=(self._count,))
+                self._mapped = self._count
+            return self._vectors, self._ids
+
+    def search(self, query, k=10):
+        """Return up to k (id, cosine similarity) pairs, most similar first"""
+        if not self._count:
+            return []
+        vectors, ids = self._snapshot()
+
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        if self.dtype == np.float32:
+            scores = vectors @ query
+        else:
+            scores = np.empty(len(ids), dtype=np.float32)
+            buffer = np.empty((min(SEARCH_BLOCK_ROWS, len(ids)), self.dim), dtype=np.float32)
+            for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+                block = vectors[start:start + SEARCH_BLOCK_ROWS]
+                converted = buffer[:len(block)]
+                np.copyto(converted, block)
+                scores[start:start + len(block)] = converted @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class SemanticIndexer:
+    """Embeds saved responses into a VectorIndex on a background thread
+
+    Call ``notify()`` after saving responses (and once at startup); the
+    worker picks up everything newer than the index's highest response id, so
+    nothing is lost if the process stops between a save and its embedding.
+    Only one process should index into a given directory.
+
+    Args:
+        db: KnowledgeDB to read responses from
+        embedder: embeddings.Embedder
+        index_dir: Directory for the VectorIndex
+        dtype: Vector storage type for the VectorIndex
+        batch_size: Responses embedded per batch
+    """
+
+    def __init__(self, db, embedder, index_dir='vector_index', dtype='float16', batch_size=64):
+        self.db = db
+        self.embedder = embedder
+        self.index_dir = index_dir
+        self.dtype = dtype
+        self.batch_size = batch_size
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def index(self):
+        # Opened on first use; the dimension is only known once the model loads.
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    self._index = VectorIndex(self.index_dir, self.embedder.dimension,
+                                              self.embedder.model_name, self.dtype)
+        return self._index
+
+    def notify(self):
+        """Wake the worker, starting it if needed, to embed newly saved responses"""
+        if self._thread is None:
+            with self._index_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='semantic-indexer',
+                                                    daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                added = self.catch_up()
+            except Exception as e:
+                print(f"Semantic indexing failed: {str(e)}")
+                continue
+            if added:
+                print(f"Semantic index: embedded {added} responses ({len(self.index)} total)")
+
+    def catch_up(self):
+        """Embed every response newer than the index watermark; returns the count"""
+        index = self.index
+        added = 0
+        batch = []
+        last_id = index.max_id
+        for response in self.db.iter_responses_since(index.max_id, batch_size=self.batch_size):
+            last_id = response['id']
+            text = (response['transcription'] or '').strip()
+            if text:
+                batch.append((response['id'], text))
+            if len(batch) >= self.batch_size:
+                added += self._add(batch)
+                batch = []
+        if batch:
+            added += self._add(batch)
+        # Responses with no text are not embedded, but must not be rescanned
+        index.advance(last_id)
+        return added
+
+    def _add(self, batch):
+        ids, texts = zip(*batch)
+        self.index.add(ids, self.embedder.encode(texts))
+        return len(batch)
+
+    def search(self, query, k=10):
+        """Responses most similar in meaning to query, with a ``similarity`` score"""
+        hits = self.index.search(self.embedder.encode([query])[0], k)
+        responses = {r['id']: r for r in self.db.get_responses_by_ids([i for i, _ in hits])}
+        results = []
+        for response_id, similarity in hits:
+            response = responses.get(response_id)
+            if response is not None:
+                response['similarity'] = round(similarity, 4)
+                results.append(response)
+        return results